@@ -0,0 +1,219 @@
+import numpy as np
+from board import Board
+from commons import *
+from evaluation import build_windows
+
+
+# (69, 4) array with the flat cell indexes (row * COLUMNS + col) of every
+# window, rows counted from the top as in Board.grid
+WINDOWS = build_windows(
+    lambda col, height: (ROWS - 1 - height) * COLUMNS + col)
+
+
+class BatchBoard:
+    """Many games held in NumPy arrays and advanced in lockstep.
+
+    cells is a (N, ROWS, COLUMNS) array laid out like Board.grid, top row
+    first. Every game has its own column heights, player to move, result and
+    done flag. Games that are over are left untouched by make_moves.
+    """
+
+    def __init__(self, count, starting_players=PLAYER1, seed=None):
+        self.cells = np.zeros((count, ROWS, COLUMNS), dtype=np.int8)
+        self.heights = np.zeros((count, COLUMNS), dtype=np.int8)
+        self.current_player = np.empty(count, dtype=np.int8)
+        self.current_player[:] = starting_players
+        self.move_count = np.zeros(count, dtype=np.int8)
+        # 0 while the game is not over, then PLAYER1, PLAYER2 or RESULT_DRAW
+        self.results = np.zeros(count, dtype=np.int8)
+        self.done = np.zeros(count, dtype=bool)
+        # Random generator for the strategies playing on the batch
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_grid(cls, grid, count, current_player, seed=None):
+        """Creates a batch of count copies of one position.
+
+        Args:
+            grid (list): The position, laid out like Board.grid.
+            count (int): The number of copies.
+            current_player (int): The player to move.
+            seed (int, optional): Seed of the random generator of the batch.
+
+        Returns:
+            BatchBoard: The batch of games.
+        """
+        boards = cls(count, current_player, seed)
+        boards.cells[:] = np.array(grid, dtype=np.int8)
+        boards.heights[:] = (boards.cells[0] != 0).sum(axis=0)
+        boards.move_count[:] = boards.heights[0].sum()
+        return boards
+
+    def __len__(self):
+        return len(self.cells)
+
+    def valid_moves(self):
+        """Returns a (N, COLUMNS) mask of the columns that are not full."""
+        return self.heights < ROWS
+
+    def random_moves(self):
+        """Draws a random valid column for every game that is not over."""
+        # The largest of uniform draws over the valid columns is a uniform
+        # choice among them
+        draws = self.rng.random((len(self), COLUMNS))
+        return np.where(self.valid_moves(), draws, -1).argmax(axis=1)
+
+    def make_moves(self, games, columns):
+        """Makes one move in each of the given games.
+
+        Args:
+            games (np.ndarray): Indexes of the games to move in, not over.
+            columns (np.ndarray): The column to play in each game, valid.
+        """
+        players = self.current_player[games]
+        rows = ROWS - 1 - self.heights[games, columns]
+        self.cells[games, rows, columns] = players
+        self.heights[games, columns] += 1
+        self.move_count[games] += 1
+        self.current_player[games] = 3 - players
+
+        windows = self.cells[games].reshape(len(games), -1)[:, WINDOWS]
+        won = (windows == players[:, None, None]).all(axis=2).any(axis=1)
+        full = self.move_count[games] == ROWS * COLUMNS
+        self.results[games[won]] = players[won]
+        self.results[games[full & ~won]] = RESULT_DRAW
+        self.done[games] = won | full
+
+    def winning_moves(self, players):
+        """Finds the moves that would complete a 4 in a row.
+
+        Args:
+            players (np.ndarray): The player making the move in each game.
+
+        Returns:
+            np.ndarray: A (N, COLUMNS) mask of the winning columns.
+        """
+        count = len(self)
+        windows = self.cells.reshape(count, -1)[:, WINDOWS]
+        # Windows with three pieces of the player and an empty cell
+        empty = windows == 0
+        threes = ((windows == players[:, None, None]).sum(axis=2) == 3) & (
+            empty.any(axis=2))
+        empty_cells = (WINDOWS * empty).sum(axis=2)
+
+        # The cell a piece would land on in every column, or -1 if full
+        landing = np.where(
+            self.heights < ROWS,
+            (ROWS - 1 - self.heights) * COLUMNS + np.arange(COLUMNS),
+            -1)
+        empty_columns = empty_cells % COLUMNS
+        playable = landing[np.arange(count)[:, None], empty_columns] == empty_cells
+        game, window = np.nonzero(threes & playable)
+
+        wins = np.zeros((count, COLUMNS), dtype=bool)
+        wins[game, empty_columns[game, window]] = True
+        return wins
+
+    def take(self, games):
+        """Returns a BatchBoard with a copy of the given games.
+
+        The copy shares the random generator of this batch.
+        """
+        boards = BatchBoard.__new__(BatchBoard)
+        boards.cells = self.cells[games]
+        boards.heights = self.heights[games]
+        boards.current_player = self.current_player[games]
+        boards.move_count = self.move_count[games]
+        boards.results = self.results[games]
+        boards.done = self.done[games]
+        boards.rng = self.rng
+        return boards
+
+    def board(self, game):
+        """Returns a Board with the position of one game."""
+        board = Board()
+        board.grid = self.cells[game].tolist()
+        board.current_player = int(self.current_player[game])
+        return board
+
+
+def random_playouts(grid, current_player, count, seed=None):
+    """Plays random games from a position, all of them in lockstep.
+
+    Args:
+        grid (list): The position, laid out like Board.grid. The game must
+            not be over.
+        current_player (int): The player to move.
+        count (int): The number of playouts.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        np.ndarray: The result of every playout.
+    """
+    boards = BatchBoard.from_grid(grid, count, current_player, seed)
+    while not boards.done.all():
+        games = np.flatnonzero(~boards.done)
+        boards.make_moves(games, boards.random_moves()[games])
+    return boards.results
+
+
+def choose_moves(strategy, boards, games):
+    """Asks a strategy for a move in each of the given games.
+
+    Strategies implementing play_batch(boards) get a BatchBoard with just
+    those games and return one column per game; the others play game by
+    game on a Board.
+
+    Args:
+        strategy: The strategy to move with.
+        boards (BatchBoard): The batch of games.
+        games (np.ndarray): Indexes of the games the strategy moves in.
+
+    Returns:
+        np.ndarray: The column to play in each of the games.
+    """
+    if hasattr(strategy, "play_batch"):
+        return np.asarray(strategy.play_batch(boards.take(games)))
+    return np.array([strategy.play(boards.board(game)) for game in games])
+
+
+def play_batch_games(total_games, p1_strategy, p2_strategy, seed=0):
+    """Plays many games between two strategies in lockstep.
+
+    All the live games advance by one move per step. As in play_games, the
+    starting player alternates between games and player 1 plays the PLAYER1
+    pieces.
+
+    Args:
+        total_games (int): The number of games to play.
+        p1_strategy: The strategy for player 1.
+        p2_strategy: The strategy for player 2.
+        seed (int, optional): Seed of the random generator of the batch.
+
+    Returns:
+        dict: A dictionary containing the results of the games
+    """
+    starting_players = np.where(
+        np.arange(total_games) % 2 == 0, PLAYER1, PLAYER2)
+    boards = BatchBoard(total_games, starting_players, seed)
+    player_strategies = {PLAYER1: p1_strategy, PLAYER2: p2_strategy}
+    p1_strategy.set_player_side(PLAYER1)
+    p2_strategy.set_player_side(PLAYER2)
+
+    while not boards.done.all():
+        # Split the live games by player to move before anybody moves
+        to_move = {
+            player: np.flatnonzero(
+                ~boards.done & (boards.current_player == player))
+            for player in player_strategies
+        }
+        for player, games in to_move.items():
+            if len(games):
+                boards.make_moves(
+                    games,
+                    choose_moves(player_strategies[player], boards, games))
+
+    return {
+        result: int((boards.results == result).sum())
+        for result in (PLAYER1, PLAYER2, RESULT_DRAW)
+    }
@@ -0,0 +1,383 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from prettytable import PrettyTable
+from batch_board import play_batch_games
+from board import Board
+from commons import *
+from test_play_games import play_seeded_game
+
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+# Relative change beyond which compare flags a metric
+DEFAULT_THRESHOLD = 0.10
+
+# Fixed position corpora: (min plies, max plies, positions, quick positions)
+CORPORA = {
+    "midgame": (10, 20, 20, 5),
+    "endgame": (26, 32, 20, 5),
+}
+
+# Strategies timed move by move: strategy, options, corpus
+STRATEGY_BENCHMARKS = {
+    "random": ("random", {}, "midgame"),
+    "winnow_or_random": ("winnow_or_random", {}, "midgame"),
+    "minimax": ("minimax", {"depth": 4}, "midgame"),
+    "mcts": ("mcts", {"playouts": 500}, "midgame"),
+    "montecarlo": ("montecarlo", {"simulations": 1000, "seed": 0}, "midgame"),
+    "solver": ("solver", {"time_ms": None}, "endgame"),
+}
+
+# Pairings played for games per second: player 1, player 2, games, quick games
+GAME_PAIRINGS = [
+    ("random", "random", 500, 100),
+    ("winnow_or_random", "random", 500, 100),
+    ("minimax", "winnow_or_random", 4, 2),
+    ("mcts", "winnow_or_random", 2, 1),
+    ("montecarlo", "winnow_or_random", 4, 2),
+]
+
+# Games played in lockstep by the batched engine
+BATCH_GAMES = (5000, 1000)
+
+# Positions of the midgame corpus the GUI levels think on
+GUI_POSITIONS = (5, 2)
+
+
+def position_corpus(min_plies, max_plies, count, seed=0):
+    """Builds a reproducible list of positions from random games.
+
+    Games that are over and positions where either player wins at once are
+    skipped: most strategies play those moves without searching.
+
+    Args:
+        min_plies (int): The fewest moves played in a position.
+        max_plies (int): The most moves played in a position.
+        count (int): The number of positions.
+        seed (int, optional): Seed of the random games.
+
+    Returns:
+        list: The positions, as Boards.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = Board()
+        plies = rng.randint(min_plies, max_plies)
+        while board.move_count < plies and not board.is_gameover():
+            board.make_move(rng.choice(board.get_valid_moves()))
+        if board.is_gameover() or any(
+                board.is_winning_move(col, player)
+                for player in (PLAYER1, PLAYER2)
+                for col in board.get_valid_moves()):
+            continue
+        positions.append(board)
+    return positions
+
+
+def _metric(value, unit, higher_is_better):
+    return {"value": value, "unit": unit,
+            "better": "higher" if higher_is_better else "lower"}
+
+
+def _best_time(function, repeat=5):
+    """Runs function repeat times and returns the fastest run, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_board(quick=False):
+    """Measures the Board operations per second over random games."""
+    rng = random.Random(0)
+    games = []
+    for _ in range(200 if quick else 1000):
+        board = Board()
+        while not board.is_gameover():
+            board.make_move(rng.choice(board.get_valid_moves()))
+        games.append(board.moves)
+    moves = sum(len(game) for game in games)
+    # Every position of the games, with the move played next
+    positions = []
+    for game in games:
+        board = Board()
+        for col in game:
+            positions.append((board.copy(), col))
+            board.make_move(col)
+
+    def make_moves():
+        for game in games:
+            board = Board()
+            for col in game:
+                board.make_move(col)
+
+    def make_and_undo():
+        for game in games:
+            board = Board()
+            for col in game:
+                board.make_move(col)
+            for _ in game:
+                board.undo_move()
+
+    def game_result():
+        for board, _ in positions:
+            board.get_game_result()
+
+    def winning_move():
+        for board, col in positions:
+            board.is_winning_move(col)
+
+    return {
+        "board.make_move": _metric(
+            moves / _best_time(make_moves), "ops/s", True),
+        "board.make_undo": _metric(
+            2 * moves / _best_time(make_and_undo), "ops/s", True),
+        "board.get_game_result": _metric(
+            moves / _best_time(game_result), "ops/s", True),
+        "board.is_winning_move": _metric(
+            moves / _best_time(winning_move), "ops/s", True),
+    }
+
+
+def _time_moves(strategy, positions):
+    """Plays a move in every position, returning the time of each move, the
+    nodes searched and the depth reached by each move, if any."""
+    times = []
+    nodes = 0
+    depths = []
+    for board in positions:
+        board = board.copy()
+        strategy.set_player_side(board.current_player)
+        strategy.play(board)
+        times.append(strategy.stats.wall_time)
+        nodes += strategy.stats.nodes
+        if strategy.stats.depth is not None:
+            depths.append(strategy.stats.depth)
+    return times, nodes, depths
+
+
+def bench_strategies(quick=False):
+    """Measures ms per move and nodes per second on the position corpora."""
+    corpora = {}
+    results = {}
+    for name, (strategy_name, options, corpus) in STRATEGY_BENCHMARKS.items():
+        if corpus not in corpora:
+            min_plies, max_plies, count, quick_count = CORPORA[corpus]
+            corpora[corpus] = position_corpus(
+                min_plies, max_plies, quick_count if quick else count)
+        random.seed(0)
+        strategy = load_strategy(strategy_name, **options)
+        times, nodes, _ = _time_moves(strategy, corpora[corpus])
+        total = sum(times)
+        results[f"strategy.{name}.ms_per_move"] = _metric(
+            1000 * total / len(times), "ms", False)
+        if nodes:
+            results[f"strategy.{name}.nodes_per_s"] = _metric(
+                nodes / total, "nodes/s", True)
+    return results
+
+
+def bench_games(quick=False):
+    """Measures the games per second of every pairing."""
+    results = {}
+    for p1_name, p2_name, games, quick_games in GAME_PAIRINGS:
+        total_games = quick_games if quick else games
+        p1_strategy = load_strategy(p1_name)
+        p2_strategy = load_strategy(p2_name)
+        start = time.perf_counter()
+        for i in range(total_games):
+            play_seeded_game(p1_strategy, p2_strategy, i, 0)
+        elapsed = time.perf_counter() - start
+        results[f"games.{p1_name}_vs_{p2_name}.games_per_s"] = _metric(
+            total_games / elapsed, "games/s", True)
+
+    total_games = BATCH_GAMES[1] if quick else BATCH_GAMES[0]
+    start = time.perf_counter()
+    play_batch_games(
+        total_games, load_strategy("winnow_or_random"),
+        load_strategy("random"))
+    results["games.batch_winnow_or_random_vs_random.games_per_s"] = _metric(
+        total_games / (time.perf_counter() - start), "games/s", True)
+    return results
+
+
+def bench_gui(quick=False):
+    """Measures the think time of the GUI difficulty levels.
+
+    The levels with a time budget always think for about as long, so their
+    nodes searched and depth reached per move are measured too: those are
+    the numbers that move when the engine gets faster or slower.
+    """
+    min_plies, max_plies, _, _ = CORPORA["midgame"]
+    positions = position_corpus(
+        min_plies, max_plies, GUI_POSITIONS[1] if quick else GUI_POSITIONS[0])
+    results = {}
+    for level, (strategy_name, options) in DIFFICULTY_LEVELS.items():
+        random.seed(0)
+        times, nodes, depths = _time_moves(
+            load_strategy(strategy_name, **options), positions)
+        results[f"gui.{level}.think_ms_mean"] = _metric(
+            1000 * sum(times) / len(times), "ms", False)
+        results[f"gui.{level}.think_ms_max"] = _metric(
+            1000 * max(times), "ms", False)
+        if "time_ms" in options:
+            results[f"gui.{level}.nodes_per_move"] = _metric(
+                nodes / len(times), "nodes", True)
+            if depths:
+                results[f"gui.{level}.depth_mean"] = _metric(
+                    sum(depths) / len(depths), "plies", True)
+    return results
+
+
+BENCHMARKS = {
+    "board": bench_board,
+    "strategy": bench_strategies,
+    "games": bench_games,
+    "gui": bench_gui,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(groups, quick=False):
+    """Runs benchmark groups.
+
+    Args:
+        groups (list): Names of the groups in BENCHMARKS to run.
+        quick (bool, optional): Use smaller corpora and fewer games.
+
+    Returns:
+        dict: The run metadata and the metrics, by name.
+    """
+    results = {}
+    for group in groups:
+        print(f"Running {group} benchmarks...", flush=True)
+        results.update(BENCHMARKS[group](quick))
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compares two benchmark runs.
+
+    Args:
+        baseline (dict): The reference run.
+        current (dict): The run to check.
+        threshold (float, optional): Relative change counted as a
+            regression or an improvement.
+
+    Returns:
+        tuple: The comparison table rows, and the names of the metrics
+            that regressed.
+    """
+    rows = []
+    regressions = []
+    for name, metric in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["value"]:
+            rows.append([name, "-", f"{metric['value']:.4g}", "-", "new"])
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        gain = change if metric["better"] == "higher" else -change
+        if gain < -threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif gain > threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append([name, f"{base['value']:.4g}", f"{metric['value']:.4g}",
+                     f"{change:+.1%}", status])
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engine, the strategies and the GUI levels.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT,
+                            help=f"JSON file to write (default: {DEFAULT_OUTPUT}).")
+    run_parser.add_argument("--groups", nargs="+", choices=BENCHMARKS.keys(),
+                            default=list(BENCHMARKS.keys()),
+                            help="Benchmark groups to run (default: all).")
+    run_parser.add_argument("--quick", action=argparse.BooleanOptionalAction,
+                            help="Use smaller corpora and fewer games.")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare a run against a baseline.")
+    compare_parser.add_argument("baseline", type=str,
+                                help="JSON file of the baseline run.")
+    compare_parser.add_argument("current", type=str, nargs="?",
+                                default=DEFAULT_OUTPUT,
+                                help=f"JSON file of the run to check (default: {DEFAULT_OUTPUT}).")
+    compare_parser.add_argument("--threshold", type=float,
+                                default=DEFAULT_THRESHOLD,
+                                help="Relative change flagged as a regression (default: 0.10).")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = run_benchmarks(args.groups, args.quick)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+        table = PrettyTable()
+        table.field_names = ["Metric", "Value", "Unit"]
+        for name, metric in report["results"].items():
+            table.add_row([name, f"{metric['value']:.4g}", metric["unit"]])
+        table.align["Metric"] = "l"
+        table.align["Value"] = "r"
+        print(table)
+        print(f"Wrote {args.output}")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    if baseline["meta"].get("quick") != current["meta"].get("quick"):
+        print("Warning: comparing a --quick run with a full run.")
+    rows, regressions = compare_results(baseline, current, args.threshold)
+
+    table = PrettyTable()
+    table.field_names = ["Metric", "Baseline", "Current", "Change", "Status"]
+    for row in rows:
+        table.add_row(row)
+    table.align["Metric"] = "l"
+    for field in ("Baseline", "Current", "Change"):
+        table.align[field] = "r"
+    print(table)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,160 @@
+import random
 import numpy as np
 from commons import *
 
 
+# Bitboard layout: every column takes ROWS + 1 bits, bottom cell first, plus
+# a sentinel bit on top so that shifts never carry a line into the next
+# column. For the standard 6x7 board the bit indexes are:
+#
+#    6 13 20 27 34 41 48   <- sentinel
+#    5 12 19 26 33 40 47
+#    4 11 18 25 32 39 46
+#    3 10 17 24 31 38 45
+#    2  9 16 23 30 37 44
+#    1  8 15 22 29 36 43
+#    0  7 14 21 28 35 42
+COLUMN_HEIGHT = ROWS + 1
+BOTTOM_MASK = sum(1 << (col * COLUMN_HEIGHT) for col in range(COLUMNS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+
+def mirror_mask(mask):
+    """Mirrors a bitboard left to right."""
+    column_mask = (1 << COLUMN_HEIGHT) - 1
+    mirrored = 0
+    for col in range(COLUMNS):
+        column = (mask >> (col * COLUMN_HEIGHT)) & column_mask
+        mirrored |= column << ((COLUMNS - 1 - col) * COLUMN_HEIGHT)
+    return mirrored
+
+
+def _lines_through(col, height):
+    """Builds the mask of every cell sharing a 4-window with (col, height)."""
+    mask = 0
+    for d_col, d_height in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for step in range(-3, 4):
+            c, h = col + step * d_col, height + step * d_height
+            if 0 <= c < COLUMNS and 0 <= h < ROWS:
+                mask |= 1 << (c * COLUMN_HEIGHT + h)
+    return mask
+
+
+# For every bit, the cells on the lines through it. A new 4 in a row must
+# contain the last piece played, so it always lies inside this mask.
+LINES_THROUGH = [
+    _lines_through(bit // COLUMN_HEIGHT, bit % COLUMN_HEIGHT)
+    for bit in range(COLUMNS * COLUMN_HEIGHT)
+]
+
+
+def has_four(mask):
+    """Checks if a player bitboard contains four aligned pieces.
+
+    Args:
+        mask (int): The bitboard of a single player.
+
+    Returns:
+        bool: True if the pieces in the mask make a 4 in a row.
+    """
+    # Vertical
+    pairs = mask & (mask >> 1)
+    if pairs & (pairs >> 2):
+        return True
+    # Horizontal
+    pairs = mask & (mask >> COLUMN_HEIGHT)
+    if pairs & (pairs >> (2 * COLUMN_HEIGHT)):
+        return True
+    # Diagonal
+    pairs = mask & (mask >> (COLUMN_HEIGHT + 1))
+    if pairs & (pairs >> (2 * (COLUMN_HEIGHT + 1))):
+        return True
+    # Opposite diagonal
+    pairs = mask & (mask >> (COLUMN_HEIGHT - 1))
+    if pairs & (pairs >> (2 * (COLUMN_HEIGHT - 1))):
+        return True
+    return False
+
+
+# Zobrist keys: a random 64-bit number for every player and bit, plus one for
+# the player to move. The seed is fixed so keys are stable across processes.
+_zobrist_random = random.Random(4)
+ZOBRIST_PIECES = [
+    [_zobrist_random.getrandbits(64) for _ in range(COLUMNS * COLUMN_HEIGHT)]
+    for _ in range(3)
+]
+ZOBRIST_TURN = [_zobrist_random.getrandbits(64) for _ in range(3)]
+
+
 class Board:
     def __init__(self):
-        self.grid = [[0] * COLUMNS for _ in range(ROWS)]
+        # One bitboard per player, indexed by PLAYER1 / PLAYER2 (slot 0 unused)
+        self.masks = [0, 0, 0]
+        # Number of pieces in each column
+        self.heights = [0] * COLUMNS
+        # Columns played so far, in order
+        self.moves = []
+        self.move_count = 0
+        # Zobrist hash of the pieces, updated at every move
+        self.zobrist = 0
         self.current_player = PLAYER1
         self.column = 0
+        self._result = None
+        # Move count at which the result was decided
+        self._result_ply = None
+
+    def copy(self):
+        """Returns an independent copy of the board, history included."""
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.masks = self.masks[:]
+        board.heights = self.heights[:]
+        board.moves = self.moves[:]
+        return board
+
+    @property
+    def grid(self):
+        """The board as a ROWS x COLUMNS list of lists, top row first."""
+        grid = [[0] * COLUMNS for _ in range(ROWS)]
+        for player in (PLAYER1, PLAYER2):
+            mask = self.masks[player]
+            for col in range(COLUMNS):
+                for height in range(self.heights[col]):
+                    if mask >> (col * COLUMN_HEIGHT + height) & 1:
+                        grid[ROWS - 1 - height][col] = player
+        return grid
+
+    @grid.setter
+    def grid(self, grid):
+        self.masks = [0, 0, 0]
+        self.heights = [0] * COLUMNS
+        self.zobrist = 0
+        for col in range(COLUMNS):
+            for row in range(ROWS - 1, -1, -1):
+                player = grid[row][col]
+                if player == 0:
+                    break
+                bit = col * COLUMN_HEIGHT + self.heights[col]
+                self.masks[player] |= 1 << bit
+                self.zobrist ^= ZOBRIST_PIECES[player][bit]
+                self.heights[col] += 1
+
+        # The order of the moves is unknown: start a new history
+        self.moves = []
+        self.move_count = sum(self.heights)
+        if has_four(self.masks[PLAYER1]):
+            self._result = PLAYER1
+        elif has_four(self.masks[PLAYER2]):
+            self._result = PLAYER2
+        elif self.move_count == ROWS * COLUMNS:
+            self._result = RESULT_DRAW
+        else:
+            self._result = None
+        self._result_ply = self.move_count
 
     def is_valid_move(self, column):
         """A move is valid if the top row of the column is empty."""
-        return self.grid[0][column] == 0
+        return self.heights[column] < ROWS
 
     def make_move(self, col):
         """Makes a move in the specified column in the first available row.
@@ -21,14 +165,93 @@ class Board:
         Returns:
             int: The row the move was made in, or -1 if the move is invalid.
         """
-        if not self.is_valid_move(col):
+        height = self.heights[col]
+        if height >= ROWS:
             return -1
 
-        for row in range(ROWS - 1, -1, -1):
-            if self.grid[row][col] == 0:
-                self.grid[row][col] = self.current_player
-                self.current_player = 3 - self.current_player  # Change player
-                return row
+        player = self.current_player
+        bit = col * COLUMN_HEIGHT + height
+        mask = self.masks[player] | (1 << bit)
+        self.masks[player] = mask
+        self.zobrist ^= ZOBRIST_PIECES[player][bit]
+        self.heights[col] = height + 1
+        self.moves.append(col)
+        self.move_count += 1
+        self.current_player = 3 - player  # Change player
+
+        # Only the lines through the new piece can have changed
+        if self._result is None:
+            if has_four(mask & LINES_THROUGH[bit]):
+                self._result = player
+                self._result_ply = self.move_count
+            elif self.move_count == ROWS * COLUMNS:
+                self._result = RESULT_DRAW
+                self._result_ply = self.move_count
+
+        return ROWS - 1 - height
+
+    def is_winning_move(self, col, player=None):
+        """Checks if a move would win the game, without making it.
+
+        Args:
+            col (int): The column of the move, which must be valid.
+            player (int, optional): The player making the move. Defaults to
+                the current player.
+
+        Returns:
+            bool: True if the move makes a 4 in a row.
+        """
+        if player is None:
+            player = self.current_player
+        bit = col * COLUMN_HEIGHT + self.heights[col]
+        return has_four((self.masks[player] | (1 << bit)) & LINES_THROUGH[bit])
+
+    def undo_move(self):
+        """Takes back the last move, restoring the player who made it.
+
+        Returns:
+            int: The column of the move taken back.
+
+        Raises:
+            IndexError: If there is no move in the history.
+        """
+        col = self.moves.pop()
+        height = self.heights[col] - 1
+        bit = col * COLUMN_HEIGHT + height
+        player = PLAYER1 if self.masks[PLAYER1] >> bit & 1 else PLAYER2
+        self.masks[player] ^= 1 << bit
+        self.zobrist ^= ZOBRIST_PIECES[player][bit]
+        self.heights[col] = height
+        if self.move_count == self._result_ply:
+            self._result = None
+            self._result_ply = None
+        self.move_count -= 1
+        self.current_player = player
+        return col
+
+    def key(self):
+        """Returns a hash of the position, including the player to move."""
+        return self.zobrist ^ ZOBRIST_TURN[self.current_player]
+
+    def canonical_key(self):
+        """Returns a compact key of the position, relative to the player to
+        move and shared with the mirrored position.
+
+        The key is the bitboard of the player to move plus the bitboard of
+        all the pieces plus BOTTOM_MASK, which is unique for every position.
+        Of the key of the position and of its mirror image, the smaller is
+        returned.
+
+        Returns:
+            tuple: The key and True if it is the key of the mirror image.
+        """
+        own = self.masks[self.current_player]
+        both = self.masks[PLAYER1] | self.masks[PLAYER2]
+        key = own + both + BOTTOM_MASK
+        mirrored_key = mirror_mask(own) + mirror_mask(both) + BOTTOM_MASK
+        if mirrored_key < key:
+            return mirrored_key, True
+        return key, False
 
     def is_gameover(self):
         """Checks if the game is over."""
@@ -40,48 +263,11 @@ class Board:
         Returns:
             int: The result of the game, or None if the game is not over.
         """
-
-        # Check for 4 in a row
-        for row in range(ROWS):
-            for col in range(COLUMNS - 3):
-                if self._check_line([(row, col + i) for i in range(4)]):
-                    return PLAYER1 if self.grid[row][col] == PLAYER1 else PLAYER2
-
-        # Check for 4 in a column
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS):
-                if self._check_line([(row + i, col) for i in range(4)]):
-                    return PLAYER1 if self.grid[row][col] == PLAYER1 else PLAYER2
-
-        # Check for 4 in a diagonal
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS - 3):
-                if self._check_line([(row + i, col + i) for i in range(4)]):
-                    return PLAYER1 if self.grid[row][col] == PLAYER1 else PLAYER2
-
-        # Check for 4 in an opposite diagonal
-        for row in range(ROWS - 3):
-            for col in range(3, COLUMNS):
-                if self._check_line([(row + i, col - i) for i in range(4)]):
-                    return PLAYER1 if self.grid[row][col] == PLAYER1 else PLAYER2
-
-        # Check for draw
-        if all(
-            self.grid[row][col] != 0 for row in range(
-                ROWS) for col in range(
-                COLUMNS)):
-            return RESULT_DRAW
-
-        return None
-
-    def _check_line(self, positions):
-        """Checks if all the positions in the list have the same value."""
-        values = [self.grid[row][col] for row, col in positions]
-        return values[0] != 0 and all(v == values[0] for v in values)
+        return self._result
 
     def get_valid_moves(self):
         """Returns a list of valid moves."""
-        return [col for col in range(COLUMNS) if self.is_valid_move(col)]
+        return [col for col in range(COLUMNS) if self.heights[col] < ROWS]
 
     def __str__(self):
         """Returns a printable string representation of the board."""
@@ -1,3 +1,5 @@
+import importlib
+
 PLAYER1 = 1
 PLAYER2 = 2
 RESULT_DRAW = 99
@@ -10,4 +12,43 @@ STRATEGY_MODULES = {
     "random": "players.random_strategy.RandomStrategy",
     "winnow_or_random": "players.winnow_or_random_strategy.WinnowOrRandomStrategy",
     "minimax": "players.minimax_strategy.MinimaxStrategy",
+    "mcts": "players.mcts_strategy.MCTSStrategy",
+    "solver": "players.solver_strategy.SolverStrategy",
+    "montecarlo": "players.montecarlo_strategy.MonteCarloStrategy",
+}
+
+# Strategy and search budget of the difficulty levels of the game
+DIFFICULTY_LEVELS = {
+    "easy": ("random", {}),
+    "medium": ("winnow_or_random", {}),
+    "hard": ("minimax", {"time_ms": 1000}),
+    "champion": ("montecarlo", {"simulations": 1000}),
 }
+
+
+def load_strategy(strategy_name, cache=None, **options):
+    """
+    Dynamically loads a strategy class from its module path.
+
+    Args:
+        strategy_name (str): The name of the strategy.
+        cache (str, optional): A position cache file, used by the strategies
+            that support one.
+        **options: Arguments of the strategy class.
+
+    Returns:
+        An instance of the strategy class.
+
+    Raises:
+        ValueError: If the strategy is not found.
+    """
+    if strategy_name not in STRATEGY_MODULES:
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+
+    module_path, class_name = STRATEGY_MODULES[strategy_name].rsplit(".", 1)
+    module = importlib.import_module(module_path)
+    strategy_class = getattr(module, class_name)
+    strategy = strategy_class(**options)
+    if cache is not None and hasattr(strategy, "open_cache"):
+        strategy.open_cache(cache)
+    return strategy
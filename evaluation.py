@@ -0,0 +1,157 @@
+import numpy as np
+from board import COLUMN_HEIGHT
+from commons import *
+
+
+# Cells are indexed column by column from the bottom: col * ROWS + height.
+# Bit position of every cell in the board bitboards
+CELL_BITS = np.array(
+    [col * COLUMN_HEIGHT + height
+     for col in range(COLUMNS) for height in range(ROWS)],
+    dtype=np.int64)
+# Height from the bottom of every cell
+CELL_HEIGHTS = np.tile(np.arange(ROWS), COLUMNS)
+CENTER_CELLS = np.arange(ROWS) + (COLUMNS // 2) * ROWS
+
+
+def build_windows(cell_index):
+    """Lists the cells of every line of 4 on the board.
+
+    Args:
+        cell_index (function): Maps a column and a height from the bottom
+            to the index of the cell in the layout of the caller.
+
+    Returns:
+        np.ndarray: A (69, 4) array with the cell indexes of every window.
+    """
+    windows = []
+    for col in range(COLUMNS):
+        for height in range(ROWS):
+            for d_col, d_height in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_col = col + 3 * d_col
+                end_height = height + 3 * d_height
+                if end_col < COLUMNS and 0 <= end_height < ROWS:
+                    windows.append([
+                        cell_index(col + i * d_col, height + i * d_height)
+                        for i in range(4)])
+    return np.array(windows)
+
+
+# (69, 4) array with the cell indexes of every window
+WINDOWS = build_windows(lambda col, height: col * ROWS + height)
+
+# Scores of the windows that only one player can still complete
+TWO_SCORE = 2
+THREE_SCORE = 5
+CENTER_SCORE = 3
+# Bonus for a threat on a row the player can hope to fill: odd rows (from
+# the bottom) for the player who moved first, even rows for the other one
+THREAT_PARITY_SCORE = 4
+
+
+def board_cells(board, player):
+    """Splits the board in the cells of a player and of the opponent.
+
+    Args:
+        board (Board): The board to read.
+        player (int): The player the cells are relative to.
+
+    Returns:
+        tuple: Two arrays of ROWS * COLUMNS zeros and ones, with the cells
+            of the player and of the opponent.
+    """
+    own = (np.int64(board.masks[player]) >> CELL_BITS) & 1
+    opp = (np.int64(board.masks[3 - player]) >> CELL_BITS) & 1
+    return own, opp
+
+
+def score_cells(own, opp, player_moved_first):
+    """Scores batches of positions from the point of view of one player.
+
+    The score counts the lines of 4 that only one side can still complete
+    (two or three pieces in), the pieces in the center column, and the
+    open threats on rows of the right parity. It is antisymmetric: swapping
+    own and opp negates it.
+
+    Args:
+        own (np.ndarray): (N, ROWS * COLUMNS) cells of the player.
+        opp (np.ndarray): (N, ROWS * COLUMNS) cells of the opponent.
+        player_moved_first (bool): True if the player made the first move
+            of the game.
+
+    Returns:
+        np.ndarray: The N scores.
+    """
+    own_windows = own[:, WINDOWS]
+    opp_windows = opp[:, WINDOWS]
+    own_count = own_windows.sum(axis=2)
+    opp_count = opp_windows.sum(axis=2)
+    own_open = opp_count == 0
+    opp_open = own_count == 0
+    own_threes = own_open & (own_count == 3)
+    opp_threes = opp_open & (opp_count == 3)
+
+    score = (
+        TWO_SCORE * ((own_open & (own_count == 2)).sum(axis=1)
+                     - (opp_open & (opp_count == 2)).sum(axis=1))
+        + THREE_SCORE * (own_threes.sum(axis=1) - opp_threes.sum(axis=1))
+        + CENTER_SCORE * (own[:, CENTER_CELLS].sum(axis=1)
+                          - opp[:, CENTER_CELLS].sum(axis=1))
+    )
+
+    # Height of the empty cell of every window, meaningful for the threes
+    empty = 1 - own_windows - opp_windows
+    threat_heights = (empty * CELL_HEIGHTS[WINDOWS]).sum(axis=2)
+    on_odd_row = threat_heights % 2 == 0
+    own_parity = on_odd_row if player_moved_first else ~on_odd_row
+    score += THREAT_PARITY_SCORE * (
+        (own_threes & own_parity).sum(axis=1)
+        - (opp_threes & ~own_parity).sum(axis=1))
+    return score
+
+
+def _player_moved_first(board, player):
+    """Checks if a player made the first move of the game on the board."""
+    first = board.current_player
+    if board.move_count % 2:
+        first = 3 - first
+    return first == player
+
+
+def evaluate(board, player):
+    """Scores a position from the point of view of a player.
+
+    Args:
+        board (Board): The board to score.
+        player (int): The player the score is relative to.
+
+    Returns:
+        int: The heuristic score of the position.
+    """
+    own, opp = board_cells(board, player)
+    return int(score_cells(
+        own[np.newaxis], opp[np.newaxis],
+        _player_moved_first(board, player))[0])
+
+
+def evaluate_children(board, player, columns):
+    """Scores the positions after each of the given moves in one call.
+
+    Args:
+        board (Board): The board before the moves.
+        player (int): The player the scores are relative to.
+        columns (list): The valid moves to score.
+
+    Returns:
+        np.ndarray: The heuristic score after each move.
+    """
+    own, opp = board_cells(board, player)
+    count = len(columns)
+    own = np.broadcast_to(own, (count, own.size)).copy()
+    opp = np.broadcast_to(opp, (count, opp.size)).copy()
+    cells = [col * ROWS + board.heights[col] for col in columns]
+    if board.current_player == player:
+        own[np.arange(count), cells] = 1
+    else:
+        opp[np.arange(count), cells] = 1
+    return score_cells(own, opp, _player_moved_first(board, player))
@@ -1,7 +1,10 @@
 import pygame
 import sys
-import random
-import numpy as np
+import threading
+from board import Board
+from commons import (
+    DIFFICULTY_LEVELS, PLAYER1, PLAYER2, load_strategy)
+from opening_book import load_book
 
 # Costanti
 WIDTH, HEIGHT = 700, 600
@@ -21,6 +24,9 @@ FONT_SIZE = 72
 SMALL_FONT_SIZE = 24
 BUTTON_COLOR = (70, 130, 180)  # Colore blu
 BUTTON_HOVER_COLOR = (100, 149, 237)  # Colore blu chiaro
+FPS = 60
+MENU_FPS = 30
+GRAVITY = 40  # Accelerazione delle pedine che cadono, in righe al secondo^2
 
 # Inizializzazione di PyGame
 pygame.init()
@@ -29,17 +35,54 @@ pygame.display.set_caption("Forza 4")
 font = pygame.font.Font(None, FONT_SIZE)
 small_font = pygame.font.Font(None, SMALL_FONT_SIZE)
 
+# Libro delle aperture (None se il file non è stato generato)
+opening_book = load_book()
+# Livelli che giocano le aperture dal libro
+BOOK_LEVELS = {"hard", "champion"}
 
-def draw_button(text, x, y, w, h, hover=False):
+
+def render_button(text, w, h, hover=False):
+    surface = pygame.Surface((w, h))
+    surface.fill(BACKGROUND_COLOR)
     color = BUTTON_HOVER_COLOR if hover else BUTTON_COLOR
     # Aggiungi angoli arrotondati
-    pygame.draw.rect(screen, color, (x, y, w, h), border_radius=10)
+    pygame.draw.rect(surface, color, (0, 0, w, h), border_radius=10)
     text_surf = font.render(text, True, FONT_COLOR)
-    text_rect = text_surf.get_rect(center=(x + w // 2, y + h // 2))
-    screen.blit(text_surf, text_rect)
+    text_rect = text_surf.get_rect(center=(w // 2, h // 2))
+    surface.blit(text_surf, text_rect)
+    return surface
 
 
 def show_difficulty_screen():
+    buttons = [
+        ("easy", "Easy", easy_button_rect),
+        ("medium", "Medium", medium_button_rect),
+        ("hard", "Hard", hard_button_rect),
+        ("champion", "Champion", champ_button_rect),
+    ]
+    # Pulsanti e testi vengono renderizzati una volta sola
+    button_surfaces = {
+        level: (render_button(text, rect.w, rect.h),
+                render_button(text, rect.w, rect.h, hover=True))
+        for level, text, rect in buttons}
+
+    screen.fill(BACKGROUND_COLOR)
+
+    # Disegna le istruzioni
+    instructions = [
+        "ISTRUZIONI PER IL GIOCO: per selezionare la colonna,",
+        "usare le frecce destra e sinistra.",
+        "Per far cadere la pedina, usare la freccia in giù.",
+    ]
+    for i, line in enumerate(instructions):
+        text = small_font.render(line, True, FONT_COLOR)
+        screen.blit(text, text.get_rect(
+            center=(WIDTH // 2, HEIGHT - 100 + 20 * i)))
+
+    clock = pygame.time.Clock()
+    # Stato dei pulsanti disegnati: si ridisegnano solo quando cambia
+    hovered = {level: None for level, _, _ in buttons}
+    first_frame = True
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -47,89 +90,32 @@ def show_difficulty_screen():
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = pygame.mouse.get_pos()
-                if easy_button_rect.collidepoint(x, y):
-                    return "easy"
-                if medium_button_rect.collidepoint(x, y):
-                    return "medium"
-                if hard_button_rect.collidepoint(x, y):
-                    return "hard"
-                if champ_button_rect.collidepoint(x, y):
-                    return "champion"
+                for level, _, rect in buttons:
+                    if rect.collidepoint(x, y):
+                        return level
 
         mouse_x, mouse_y = pygame.mouse.get_pos()
-        screen.fill(BACKGROUND_COLOR)
-
-        # Disegna i pulsanti
-        draw_button(
-            "Easy",
-            200,
-            200,
-            300,
-            50,
-            hover=easy_button_rect.collidepoint(
-                mouse_x,
-                mouse_y))
-        draw_button(
-            "Medium",
-            200,
-            275,
-            300,
-            50,
-            hover=medium_button_rect.collidepoint(
-                mouse_x,
-                mouse_y))
-        draw_button(
-            "Hard",
-            200,
-            350,
-            300,
-            50,
-            hover=hard_button_rect.collidepoint(
-                mouse_x,
-                mouse_y))
-        draw_button(
-            "Champion",
-            200,
-            425,
-            300,
-            50,
-            hover=champ_button_rect.collidepoint(
-                mouse_x,
-                mouse_y))
-
-        # Disegna le istruzioni
-        instructions_line1 = "ISTRUZIONI PER IL GIOCO: per selezionare la colonna,"
-        instructions_line2 = "usare le frecce destra e sinistra."
-        instructions_line3 = "Per far cadere la pedina, usare la freccia in giù."
-
-        # Renderizza il testo su più righe
-        instruction_text1 = small_font.render(
-            instructions_line1, True, FONT_COLOR)
-        instruction_text2 = small_font.render(
-            instructions_line2, True, FONT_COLOR)
-        instruction_text3 = small_font.render(
-            instructions_line3, True, FONT_COLOR)
-
-        # Posiziona le righe di testo
-        instruction_rect1 = instruction_text1.get_rect(
-            center=(WIDTH // 2, HEIGHT - 100))
-        instruction_rect2 = instruction_text2.get_rect(
-            center=(WIDTH // 2, HEIGHT - 80))
-        instruction_rect3 = instruction_text3.get_rect(
-            center=(WIDTH // 2, HEIGHT - 60))
-
-        screen.blit(instruction_text1, instruction_rect1)
-        screen.blit(instruction_text2, instruction_rect2)
-        screen.blit(instruction_text3, instruction_rect3)
-
-        pygame.display.flip()
-
-
-def draw_grid():
+        dirty = []
+        for level, _, rect in buttons:
+            hover = rect.collidepoint(mouse_x, mouse_y)
+            if hover != hovered[level]:
+                hovered[level] = hover
+                screen.blit(button_surfaces[level][hover], rect)
+                dirty.append(rect)
+
+        if first_frame:
+            pygame.display.flip()
+            first_frame = False
+        elif dirty:
+            pygame.display.update(dirty)
+        clock.tick(MENU_FPS)
+
+
+def draw_grid(surface):
     for row in range(ROWS):
         for col in range(COLS):
             pygame.draw.rect(
-                screen,
+                surface,
                 GRID_COLOR,
                 (col * CELL_SIZE,
                  row * CELL_SIZE,
@@ -138,21 +124,18 @@ def draw_grid():
                 2)
 
 
-def draw_piece(row, col, color):
+def render_piece(color):
+    surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
     pygame.draw.circle(
-        screen,
+        surface,
         color,
-        (col *
-         CELL_SIZE +
-         CELL_SIZE //
-         2,
-         row *
-         CELL_SIZE +
-         CELL_SIZE //
-         2),
-        CELL_SIZE //
-        2 -
-        10)
+        (CELL_SIZE // 2, CELL_SIZE // 2),
+        CELL_SIZE // 2 - 10)
+    return surface
+
+
+def column_rect(col):
+    return pygame.Rect(col * CELL_SIZE, 0, CELL_SIZE, HEIGHT)
 
 
 def draw_cursor(col):
@@ -167,42 +150,14 @@ def draw_cursor(col):
         CURSOR_WIDTH)
 
 
-def display_thinking_message():
-    text = small_font.render("Il computer sta pensando...", True, FONT_COLOR)
-    text_rect = text.get_rect(topright=(WIDTH - 10, 10))
-    screen.blit(text, text_rect)
-
-
-def drop_piece(grid, col, color):
-    for row in range(ROWS - 1, -1, -1):
-        if grid[row][col] == 0:
-            grid[row][col] = color
-            return row
-    return -1
-
-
-def check_win(grid, color):
-    # Verifica orizzontale
-    for row in range(ROWS):
-        for col in range(COLS - 3):
-            if all(grid[row][col + i] == color for i in range(4)):
-                return True
-    # Verifica verticale
-    for row in range(ROWS - 3):
-        for col in range(COLS):
-            if all(grid[row + i][col] == color for i in range(4)):
-                return True
-    # Verifica diagonale /
-    for row in range(3, ROWS):
-        for col in range(COLS - 3):
-            if all(grid[row - i][col + i] == color for i in range(4)):
-                return True
-    # Verifica diagonale \
-    for row in range(ROWS - 3):
-        for col in range(COLS - 3):
-            if all(grid[row + i][col + i] == color for i in range(4)):
-                return True
-    return False
+def book_move(board):
+    # Mossa del computer presa dal libro delle aperture, se presente
+    if opening_book is None:
+        return None
+    entry = opening_book.lookup(board)
+    if entry is None or not board.is_valid_move(entry[0]):
+        return None
+    return entry[0]
 
 
 def display_winner(message):
@@ -213,173 +168,278 @@ def display_winner(message):
     pygame.time.wait(3000)  # Attendere 3 secondi
 
 
-def ai_move_easy(grid):
-    available_columns = [c for c in range(COLS) if grid[0][c] == 0]
-    if available_columns:
-        col = random.choice(available_columns)
-        drop_piece(grid, col, PLAYER2_COLOR)
-
-
-def ai_move_medium(grid):
-    def can_win(grid, color, col):
-        temp_grid = [row[:] for row in grid]
-        row = drop_piece(temp_grid, col, color)
-        if row != -1 and check_win(temp_grid, color):
-            return True
-        return False
-
-    for col in range(COLS):
-        if grid[0][col] == 0:
-            if can_win(grid, PLAYER1_COLOR, col):
-                drop_piece(grid, col, PLAYER2_COLOR)
-                return
-
-    available_columns = [c for c in range(COLS) if grid[0][c] == 0]
-    if available_columns:
-        col = random.choice(available_columns)
-        drop_piece(grid, col, PLAYER2_COLOR)
-
-
-def ai_move_hard(grid):
-    def evaluate_board(board):
-        if check_win(board, PLAYER2_COLOR):
-            return 1000
-        if check_win(board, PLAYER1_COLOR):
-            return -1000
-        return 0
-
-    def minimax(board, depth, is_maximizing):
-        if depth == 0 or check_win(
-                board, PLAYER1_COLOR) or check_win(
-                board, PLAYER2_COLOR):
-            return evaluate_board(board)
-
-        if is_maximizing:
-            max_eval = -float('inf')
-            available_columns = [c for c in range(COLS) if board[0][c] == 0]
-            random.shuffle(available_columns)  # Introduce randomness
-            for col in available_columns:
-                row = drop_piece(board, col, PLAYER2_COLOR)
-                eval = minimax(board, depth - 1, False)
-                board[row][col] = 0
-                max_eval = max(max_eval, eval)
-            return max_eval
-        else:
-            min_eval = float('inf')
-            available_columns = [c for c in range(COLS) if board[0][c] == 0]
-            random.shuffle(available_columns)  # Introduce randomness
-            for col in available_columns:
-                row = drop_piece(board, col, PLAYER1_COLOR)
-                eval = minimax(board, depth - 1, True)
-                board[row][col] = 0
-                min_eval = min(min_eval, eval)
-            return min_eval
-
-    def find_best_move(board):
-        best_move = None
-        best_value = -float('inf')
-        available_columns = [c for c in range(COLS) if board[0][c] == 0]
-        random.shuffle(available_columns)  # Introduce randomness
-        for col in available_columns:
-            temp_board = [row[:] for row in board]
-            row = drop_piece(temp_board, col, PLAYER2_COLOR)
-            move_value = minimax(temp_board, 4, False)
-            board[row][col] = 0
-            if move_value > best_value:
-                best_value = move_value
-                best_move = col
-        return best_move
-
-    best_col = find_best_move(grid)
-    if best_col is not None:
-        drop_piece(grid, best_col, PLAYER2_COLOR)
-
-
-def ai_move_champion(grid, simulations=1000):
-    def is_forced_move(board, color):
-        def can_win_with_move(temp_board, color, col):
-            row = drop_piece(temp_board, col, color)
-            win = check_win(temp_board, color)
-            temp_board[row][col] = 0
-            return win
-
-        def find_forced_move(color):
-            # Controlla le mosse che vincono per il giocatore
-            for col in range(COLS):
-                if board[0][col] == 0:
-                    temp_board = [row[:] for row in board]
-                    if can_win_with_move(temp_board, color, col):
-                        return col
-            return None
-
-        # Verifica se c'è una mossa forzata per il giocatore
-        move = find_forced_move(PLAYER2_COLOR)
-        if move is not None:
-            return move
-
-        # Verifica se c'è una mossa forzata per l'avversario e blocca
-        move = find_forced_move(PLAYER1_COLOR)
-        if move is not None:
-            return move
-
+def load_ai(difficulty_level):
+    # Strategia del computer, con il budget di ricerca del livello
+    strategy_name, options = DIFFICULTY_LEVELS[difficulty_level]
+    strategy = load_strategy(strategy_name, **options)
+    strategy.set_player_side(PLAYER2)
+    return strategy
+
+
+def choose_move(strategy, board, use_book=False):
+    col = book_move(board) if use_book else None
+    if col is None:
+        col = strategy.play(board)
+    return col
+
+
+class Ponderer:
+    # Durante il turno del giocatore cerca in anticipo la risposta del
+    # computer a ogni sua mossa possibile, partendo dalle colonne vicine al
+    # cursore. Le risposte finiscono in una tabella indicizzata per
+    # posizione. Usa una propria istanza della strategia, così non
+    # interferisce con le ricerche di AIWorker
+
+    def __init__(self, strategy, use_book=False):
+        self.strategy = strategy
+        self.use_book = use_book
+        # board.key() della posizione dopo la mossa del giocatore -> risposta
+        self.table = {}
+        self._condition = threading.Condition()
+        self._board = None
+        self._column = 0
+        self._searching = None
+        # Interrompe la ricerca in corso, se la strategia lo permette
+        self._stop = threading.Event()
+        if hasattr(strategy, "stop_event"):
+            strategy.stop_event = self._stop
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def start(self, board, column):
+        with self._condition:
+            self.table.clear()
+            self._board = board.copy()
+            self._column = column
+            self._condition.notify_all()
+
+    def follow(self, column):
+        # Le risposte alla colonna sotto il cursore vengono cercate prima
+        with self._condition:
+            self._column = column
+
+    def wait_for(self, board):
+        # Smette di cercare e restituisce la risposta per la posizione, se è
+        # già pronta o in corso di ricerca; altrimenti None. Una ricerca in
+        # corso per un'altra posizione viene interrotta, così non rallenta
+        # quella di AIWorker
+        key = board.key()
+        with self._condition:
+            self._board = None
+            if self._searching is not None and self._searching != key:
+                self._stop.set()
+            while key not in self.table and self._searching == key:
+                self._condition.wait()
+            return self.table.get(key)
+
+    def _next_position(self):
+        # Prossima mossa del giocatore da esplorare, o None se sono finite
+        board = self._board
+        replies = sorted(
+            board.get_valid_moves(), key=lambda col: abs(col - self._column))
+        for col in replies:
+            child = board.copy()
+            child.make_move(col)
+            if not child.is_gameover() and child.key() not in self.table:
+                return child
         return None
 
-    def simulate_game(board, player_color):
-        available_columns = [c for c in range(COLS) if board[0][c] == 0]
-        if not available_columns:
-            return 0  # Pareggio
-
+    def _run(self):
         while True:
-            col = random.choice(available_columns)
-            row = drop_piece(board, col, player_color)
-
-            if check_win(board, player_color):
-                return 1
-            if all(board[0][c] != 0 for c in range(COLS)):
-                return 0
-
-            player_color = PLAYER1_COLOR if player_color == PLAYER2_COLOR else PLAYER2_COLOR
-            available_columns = [c for c in range(COLS) if board[0][c] == 0]
-
-    def get_best_move(board):
-        move_scores = np.zeros(COLS)
-
-        # Controlla se c'è una mossa forzata
-        forced_move = is_forced_move(board, PLAYER2_COLOR)
-        if forced_move is not None:
-            return forced_move
-
-        remaining_moves = sum(board[0][c] == 0 for c in range(COLS))
-        num_simulations = simulations if remaining_moves > 20 else 500 if remaining_moves > 10 else 100
-
-        for col in range(COLS):
-            if board[0][col] == 0:
-                temp_board = [row[:] for row in board]
-                row = drop_piece(temp_board, col, PLAYER2_COLOR)
-
-                wins = sum(simulate_game(
-                    [row[:] for row in temp_board], PLAYER1_COLOR) for _ in range(num_simulations))
-                move_scores[col] = wins
-
-                temp_board[row][col] = 0
-
-        return np.argmax(move_scores) if np.any(move_scores) else None
-
-    best_col = get_best_move(grid)
-    if best_col is not None:
-        drop_piece(grid, best_col, PLAYER2_COLOR)
+            with self._condition:
+                while self._board is None:
+                    self._condition.wait()
+                board = self._next_position()
+                if board is None:
+                    self._board = None
+                    continue
+                key = board.key()
+                self._searching = key
+                self._stop.clear()
+            col = None
+            try:
+                col = choose_move(self.strategy, board, self.use_book)
+            finally:
+                # Anche se la ricerca fallisce wait_for non resta bloccato;
+                # la mossa di una ricerca interrotta viene scartata
+                with self._condition:
+                    if col is not None and not self._stop.is_set():
+                        self.table[key] = col
+                    self._searching = None
+                    self._condition.notify_all()
+
+
+class AIWorker:
+    # Calcola le mosse del computer in un thread, così il ciclo principale
+    # continua a disegnare e a gestire gli eventi mentre il computer pensa
+
+    def __init__(self, strategy, use_book=False, ponderer=None):
+        self.strategy = strategy
+        self.use_book = use_book
+        self.ponderer = ponderer
+        self._thread = None
+        self._move = None
+
+    def start(self, board):
+        # La strategia lavora su una copia: la scacchiera resta libera per
+        # il disegno. Il thread è daemon, quindi si può uscire senza
+        # aspettare la fine della ricerca
+        self._move = None
+        self._thread = threading.Thread(
+            target=self._run, args=(board.copy(),), daemon=True)
+        self._thread.start()
+
+    def _run(self, board):
+        col = None
+        if self.ponderer is not None:
+            col = self.ponderer.wait_for(board)
+        if col is None:
+            col = choose_move(self.strategy, board, self.use_book)
+        self._move = col
+
+    def is_thinking(self):
+        return self._thread is not None
+
+    def poll(self):
+        # Mossa del computer, oppure None se sta ancora pensando
+        if self._thread is None or self._thread.is_alive():
+            return None
+        self._thread = None
+        return self._move
+
+
+class FallingPiece:
+    # Pedina appena giocata, che cade dall'alto fino alla sua riga
+
+    def __init__(self, board, col):
+        self.col = col
+        self.target_row = ROWS - 1 - board.heights[col]
+        self.player = board.current_player
+        self.row = 0.0
+        self.speed = 0.0
+
+    def update(self, dt):
+        # Restituisce True quando la pedina è arrivata
+        self.speed += GRAVITY * dt
+        self.row = min(self.row + self.speed * dt, self.target_row)
+        return self.row >= self.target_row
+
+
+def play_move(board, col):
+    # Gioca la mossa e restituisce l'animazione della pedina
+    falling = FallingPiece(board, col)
+    board.make_move(col)
+    return falling
+
+
+class Renderer:
+    # Disegna la partita ridisegnando solo le colonne cambiate dall'ultimo
+    # frame: pedina nuova o in caduta, cursore, messaggio di attesa. Sfondo,
+    # griglia, pedine e testi sono renderizzati una volta sola
+
+    def __init__(self):
+        self.background = pygame.Surface((WIDTH, HEIGHT))
+        self.background.fill(BACKGROUND_COLOR)
+        draw_grid(self.background)
+        self.pieces = {
+            player: render_piece(color)
+            for player, color in PLAYER_COLORS.items()}
+        # Messaggio di attesa con 0-3 puntini animati
+        self.thinking_texts = [
+            small_font.render(
+                "Il computer sta pensando" + "." * dots, True, FONT_COLOR)
+            for dots in range(4)]
+        self.thinking_columns = {
+            col for col in range(COLS)
+            if column_rect(col).colliderect(
+                self.thinking_texts[-1].get_rect(topright=(WIDTH - 10, 10)))}
+        # Stato disegnato nell'ultimo frame
+        self._grid = None
+        self._move_count = None
+        self._column = None
+        self._falling_col = None
+        self._thinking = None
+
+    def draw(self, board, column, falling=None, thinking=False):
+        dirty = set()
+        if board.move_count != self._move_count:
+            grid = board.grid
+            for col in range(COLS):
+                if self._grid is None or any(
+                        grid[row][col] != self._grid[row][col]
+                        for row in range(ROWS)):
+                    dirty.add(col)
+            self._grid = grid
+            self._move_count = board.move_count
+        if column != self._column:
+            dirty.update((column, self._column))
+            self._column = column
+        falling_col = falling.col if falling is not None else None
+        # La colonna della pedina in caduta, anche nel frame in cui arriva
+        dirty.update((falling_col, self._falling_col))
+        self._falling_col = falling_col
+        thinking_state = (
+            pygame.time.get_ticks() // 300 % 4 if thinking else None)
+        if thinking_state != self._thinking:
+            dirty.update(self.thinking_columns)
+            self._thinking = thinking_state
+        dirty.discard(None)
+
+        rects = [self._draw_column(col, falling) for col in sorted(dirty)]
+        screen.set_clip(None)
+        if rects:
+            pygame.display.update(rects)
+
+    def _draw_column(self, col, falling):
+        rect = column_rect(col)
+        screen.set_clip(rect)
+        screen.blit(self.background, rect, rect)
+        for row in range(ROWS):
+            player = self._grid[row][col]
+            if player == 0:
+                continue
+            if (falling is not None and row == falling.target_row
+                    and col == falling.col):
+                continue
+            screen.blit(
+                self.pieces[player], (col * CELL_SIZE, row * CELL_SIZE))
+        if falling is not None and col == falling.col:
+            screen.blit(self.pieces[falling.player],
+                        (col * CELL_SIZE, falling.row * CELL_SIZE))
+        if col == self._column:
+            draw_cursor(col)
+        if self._thinking is not None and col in self.thinking_columns:
+            text = self.thinking_texts[self._thinking]
+            screen.blit(text, text.get_rect(topright=(WIDTH - 10, 10)))
+        return rect
+
+
+def display_result(board):
+    result = board.get_game_result()
+    if result == PLAYER1:
+        display_winner("Player 1 Wins!")
+    elif result == PLAYER2:
+        display_winner("Computer Wins!")
+    else:
+        display_winner("Draw!")
 
 
 def main():
-    global grid
     difficulty_level = show_difficulty_screen()
+    use_book = difficulty_level in BOOK_LEVELS
+    ponderer = Ponderer(load_ai(difficulty_level), use_book)
+    ai = AIWorker(load_ai(difficulty_level), use_book, ponderer)
 
-    grid = [[0] * COLS for _ in range(ROWS)]
+    board = Board()
+    board.current_player = PLAYER1
     clock = pygame.time.Clock()
-    turn = 0
     column = 0
+    falling = None
+    renderer = Renderer()
+    ponderer.start(board, column)
 
     while True:
+        dt = clock.tick(FPS) / 1000
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -387,75 +447,33 @@ def main():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_LEFT:
                     column = max(column - 1, 0)
+                    ponderer.follow(column)
                 if event.key == pygame.K_RIGHT:
                     column = min(column + 1, COLS - 1)
+                    ponderer.follow(column)
                 if event.key == pygame.K_DOWN:
-                    if turn == 0:
-                        row = drop_piece(grid, column, PLAYER1_COLOR)
-                        if row != -1:
-                            screen.fill(BACKGROUND_COLOR)
-                            draw_grid()
-                            for r in range(ROWS):
-                                for c in range(COLS):
-                                    if grid[r][c] != 0:
-                                        draw_piece(
-                                            r, c, PLAYER_COLORS.get(
-                                                grid[r][c]))
-                            draw_cursor(column)
-                            pygame.display.flip()
-
-                            if check_win(grid, PLAYER1_COLOR):
-                                display_winner("Player 1 Wins!")
-                                return
-
-                            turn = 1
-                            pygame.time.wait(100)
-
-                            screen.fill(BACKGROUND_COLOR)
-                            draw_grid()
-                            for r in range(ROWS):
-                                for c in range(COLS):
-                                    if grid[r][c] != 0:
-                                        draw_piece(r, c, grid[r][c])
-                            draw_cursor(column)
-                            display_thinking_message()
-                            pygame.display.flip()
-
-                            pygame.time.wait(500)
-
-                            if difficulty_level == "easy":
-                                ai_move_easy(grid)
-                            elif difficulty_level == "medium":
-                                ai_move_medium(grid)
-                            elif difficulty_level == "hard":
-                                ai_move_hard(grid)
-                            elif difficulty_level == "champion":
-                                ai_move_champion(grid)
-
-                            screen.fill(BACKGROUND_COLOR)
-                            draw_grid()
-                            for r in range(ROWS):
-                                for c in range(COLS):
-                                    if grid[r][c] != 0:
-                                        draw_piece(r, c, grid[r][c])
-                            draw_cursor(column)
-                            pygame.display.flip()
-
-                            if check_win(grid, PLAYER2_COLOR):
-                                display_winner("Computer Wins!")
-                                return
-
-                            turn = 0
-
-        screen.fill(BACKGROUND_COLOR)
-        draw_grid()
-        for row in range(ROWS):
-            for col in range(COLS):
-                if grid[row][col] != 0:
-                    draw_piece(row, col, grid[row][col])
-        draw_cursor(column)
-        pygame.display.flip()
-        clock.tick(60)
+                    if (falling is None and not ai.is_thinking()
+                            and board.current_player == PLAYER1
+                            and board.is_valid_move(column)):
+                        falling = play_move(board, column)
+
+        if falling is not None:
+            if falling.update(dt):
+                falling = None
+                if board.is_gameover():
+                    renderer.draw(board, column)
+                    display_result(board)
+                    return
+                if board.current_player == PLAYER2:
+                    ai.start(board)
+                else:
+                    ponderer.start(board, column)
+        else:
+            ai_col = ai.poll()
+            if ai_col is not None:
+                falling = play_move(board, ai_col)
+
+        renderer.draw(board, column, falling, thinking=ai.is_thinking())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+import argparse
+import json
+from prettytable import PrettyTable
+from board import Board
+from commons import *
+
+
+DEFAULT_LOG_PATH = "games.jsonl"
+
+# Names of the results in the records and the reports
+RESULT_NAMES = {PLAYER1: "player1", PLAYER2: "player2", RESULT_DRAW: "draw"}
+
+
+class GameLogWriter:
+    """Appends finished games to a JSON Lines file, one game per line.
+
+    Every record holds the strategy names, the seed of the run, the index of
+    the game, the starting player, the columns played as a string of digits
+    and the result. Lines are written as soon as each game ends, so a run
+    stopped halfway keeps every game finished so far, and runs can be
+    appended to the same file.
+
+    Args:
+        path (str): The log file, created if missing.
+        p1_name (str): The name of the strategy of player 1.
+        p2_name (str): The name of the strategy of player 2.
+        seed (int): The seed of the run.
+    """
+
+    def __init__(self, path, p1_name, p2_name, seed):
+        self.path = path
+        self.p1_name = p1_name
+        self.p2_name = p2_name
+        self.seed = seed
+        self.games = 0
+        # Line buffered: every game reaches the file when it is written
+        self._file = open(path, "a", buffering=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, game_index, starting_player, moves, result):
+        """Appends a game to the log.
+
+        Args:
+            game_index (int): The index of the game in the run.
+            starting_player (int): The player who moved first.
+            moves (list): The columns played, in order.
+            result (int): The result of the game.
+        """
+        self._file.write(json.dumps({
+            "p1": self.p1_name,
+            "p2": self.p2_name,
+            "seed": self.seed,
+            "game": game_index,
+            "start": starting_player,
+            "moves": "".join(map(str, moves)),
+            "result": result,
+        }, separators=(",", ":")) + "\n")
+        self.games += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_games(path):
+    """Streams the games of a log file, one at a time.
+
+    Args:
+        path (str): The log file.
+
+    Yields:
+        dict: A game record, with the moves as a list of columns.
+    """
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record["moves"] = [int(col) for col in record["moves"]]
+            yield record
+
+
+def filter_games(games, p1=None, p2=None, start=None, result=None,
+                 opening=None):
+    """Streams the games matching every given condition.
+
+    Args:
+        games (iterable): Game records, as yielded by read_games.
+        p1 (str, optional): The strategy of player 1.
+        p2 (str, optional): The strategy of player 2.
+        start (int, optional): The starting player.
+        result (int, optional): The result.
+        opening (list, optional): The first columns played.
+
+    Yields:
+        dict: The matching game records.
+    """
+    for game in games:
+        if p1 is not None and game["p1"] != p1:
+            continue
+        if p2 is not None and game["p2"] != p2:
+            continue
+        if start is not None and game["start"] != start:
+            continue
+        if result is not None and game["result"] != result:
+            continue
+        if opening is not None and game["moves"][:len(opening)] != opening:
+            continue
+        yield game
+
+
+def replay(game):
+    """Replays a game record on a Board.
+
+    Args:
+        game (dict): A game record, as yielded by read_games.
+
+    Returns:
+        Board: The board at the end of the game.
+
+    Raises:
+        ValueError: If a move is invalid or the result does not match.
+    """
+    board = Board()
+    board.current_player = game["start"]
+    for col in game["moves"]:
+        if board.is_gameover() or not board.is_valid_move(col):
+            raise ValueError(
+                f"Invalid move {col} in game {game['game']} at ply "
+                f"{board.move_count}")
+        board.make_move(col)
+    if board.get_game_result() != game["result"]:
+        raise ValueError(f"Result of game {game['game']} does not match")
+    return board
+
+
+def results_by_opening(games, plies=1):
+    """Counts the results of the games by starting player and first moves.
+
+    The same columns make a different opening depending on who played
+    them, so the games started by each player are counted apart.
+
+    Args:
+        games (iterable): Game records, as yielded by read_games.
+        plies (int, optional): The number of moves of an opening.
+
+    Returns:
+        dict: For every (starting player, opening as a string of columns),
+            the number of games won by each player and drawn, keyed by
+            result.
+    """
+    openings = {}
+    for game in games:
+        opening = (game["start"], "".join(map(str, game["moves"][:plies])))
+        counts = openings.get(opening)
+        if counts is None:
+            counts = openings[opening] = dict.fromkeys(RESULT_NAMES, 0)
+        counts[game["result"]] += 1
+    return openings
+
+
+def main():
+    # Log and filters shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("log", type=str, nargs="?", default=DEFAULT_LOG_PATH,
+                        help=f"The game log (default: {DEFAULT_LOG_PATH}).")
+    common.add_argument("--player1", type=str, default=None,
+                        help="Only games with this strategy as player 1.")
+    common.add_argument("--player2", type=str, default=None,
+                        help="Only games with this strategy as player 2.")
+    common.add_argument("--start", type=int, choices=(PLAYER1, PLAYER2),
+                        default=None,
+                        help="Only games started by this player.")
+    common.add_argument("--opening", type=str, default=None,
+                        help="Only games opening with these columns, e.g. 33.")
+
+    parser = argparse.ArgumentParser(
+        description="Replay and analyze a log of games.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    openings_parser = subparsers.add_parser(
+        "openings", parents=[common], help="Results by opening.")
+    openings_parser.add_argument("--plies", type=int, default=1,
+                                 help="Moves of an opening (default: 1).")
+    openings_parser.add_argument("--min-games", type=int, default=1,
+                                 help="Hide openings with fewer games (default: 1).")
+
+    replay_parser = subparsers.add_parser(
+        "replay", parents=[common],
+        help="Replay the games, printing the final boards.")
+    replay_parser.add_argument("--limit", type=int, default=10,
+                               help="Games to print (default: 10).")
+
+    subparsers.add_parser(
+        "check", parents=[common],
+        help="Replay every game, checking moves and results.")
+
+    args = parser.parse_args()
+    opening = [int(col) for col in args.opening] if args.opening else None
+    games = filter_games(
+        read_games(args.log), args.player1, args.player2, args.start,
+        opening=opening)
+
+    if args.command == "openings":
+        openings = results_by_opening(games, args.plies)
+        table = PrettyTable()
+        table.field_names = ["Start", "Opening", "Games", "P1 wins",
+                             "P2 wins", "Draws", "P1 score (%)"]
+        rows = []
+        for (start, name), counts in openings.items():
+            total = sum(counts.values())
+            if total < args.min_games:
+                continue
+            score = (counts[PLAYER1] + 0.5 * counts[RESULT_DRAW]) / total
+            rows.append([f"P{start}", name, total, counts[PLAYER1],
+                         counts[PLAYER2], counts[RESULT_DRAW], score])
+        rows.sort(key=lambda row: row[-1])
+        for row in rows:
+            table.add_row(row[:-1] + [f"{row[-1] * 100:.1f}%"])
+        table.align = "r"
+        table.align["Opening"] = "l"
+        print(table)
+    elif args.command == "replay":
+        for count, game in enumerate(games):
+            if count == args.limit:
+                break
+            board = replay(game)
+            print(f"Game {game['game']} (seed {game['seed']}): "
+                  f"{game['p1']} vs {game['p2']}, player {game['start']} "
+                  f"starts, result {RESULT_NAMES[game['result']]}")
+            print(" ".join(map(str, game["moves"])))
+            print(board)
+            print()
+    else:
+        total = 0
+        for game in games:
+            replay(game)
+            total += 1
+        print(f"{total} games replayed, all moves and results match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import functools
+import math
+import time
+
+
+class MoveStats:
+    """Search statistics of the last move played by a strategy.
+
+    Every strategy has a `stats` attribute, reset and filled by each call to
+    play. Strategies count what fits their search: a node is a position
+    visited by a tree search, or a random game for the Monte Carlo
+    strategies.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        # Positions scored by the evaluation or by the end of a random game
+        self.leaf_evals = 0
+        # Searches cut off by alpha-beta bounds
+        self.prunes = 0
+        # Positions or subtrees found in a table or reused tree
+        self.cache_hits = 0
+        # Plies searched, or None for strategies that do not search ahead
+        self.depth = None
+        # Seconds spent in play
+        self.wall_time = 0.0
+
+    def add(self, other):
+        """Adds the counters of a search run elsewhere, like a worker."""
+        self.nodes += other.nodes
+        self.leaf_evals += other.leaf_evals
+        self.prunes += other.prunes
+        self.cache_hits += other.cache_hits
+        if other.depth is not None:
+            self.depth = max(self.depth or 0, other.depth)
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.wall_time if self.wall_time else 0.0
+
+    def as_dict(self):
+        return {
+            "nodes": self.nodes,
+            "leaf_evals": self.leaf_evals,
+            "prunes": self.prunes,
+            "cache_hits": self.cache_hits,
+            "depth": self.depth,
+            "wall_time": self.wall_time,
+        }
+
+
+def record_stats(play):
+    """Decorates the play method of a strategy: resets its stats before
+    every move and records the wall time of the move."""
+    @functools.wraps(play)
+    def wrapper(self, board):
+        self.stats.reset()
+        start = time.perf_counter()
+        try:
+            return play(self, board)
+        finally:
+            self.stats.wall_time = time.perf_counter() - start
+    return wrapper
+
+
+class MoveSummary:
+    """Running totals of the moves of a run, by player: latency percentiles
+    and search speed in constant memory, whatever the number of moves.
+
+    Latencies are counted in buckets growing by LATENCY_RATIO, so the
+    percentiles are within 2% of the exact ones; the maximum is exact.
+    """
+
+    # Bounds of the latency buckets, in seconds, and ratio between two
+    # consecutive buckets
+    MIN_LATENCY = 1e-6
+    MAX_LATENCY = 1e4
+    LATENCY_RATIO = 1.02
+    BUCKETS = math.ceil(
+        math.log(MAX_LATENCY / MIN_LATENCY) / math.log(LATENCY_RATIO))
+
+    def __init__(self):
+        self._players = {}
+
+    def add(self, player, wall_time, nodes):
+        """Counts a move.
+
+        Args:
+            player (int): The player who made the move.
+            wall_time (float): The seconds the move took.
+            nodes (int): The nodes searched for the move.
+        """
+        totals = self._players.get(player)
+        if totals is None:
+            totals = self._players[player] = {
+                "moves": 0, "time": 0.0, "nodes": 0, "max": 0.0,
+                "counts": [0] * self.BUCKETS}
+        totals["moves"] += 1
+        totals["time"] += wall_time
+        totals["nodes"] += nodes
+        totals["max"] = max(totals["max"], wall_time)
+        bucket = 0
+        if wall_time > self.MIN_LATENCY:
+            bucket = min(self.BUCKETS - 1, int(
+                math.log(wall_time / self.MIN_LATENCY)
+                / math.log(self.LATENCY_RATIO)))
+        totals["counts"][bucket] += 1
+
+    def _percentile(self, totals, fraction):
+        rank = fraction * totals["moves"]
+        seen = 0
+        for bucket, count in enumerate(totals["counts"]):
+            seen += count
+            if seen >= rank and count:
+                middle = self.MIN_LATENCY * self.LATENCY_RATIO ** (bucket + 0.5)
+                return min(middle, totals["max"])
+        return totals["max"]
+
+    def statistics(self, player):
+        """Summarizes the moves of a player.
+
+        Args:
+            player (int): The player whose moves are summarized.
+
+        Returns:
+            dict: The number of moves, the p50, p95 and max latency in
+                milliseconds, and the nodes searched per second, or None if
+                the player made no move.
+        """
+        totals = self._players.get(player)
+        if totals is None:
+            return None
+        return {
+            "moves": totals["moves"],
+            "p50_ms": self._percentile(totals, 0.50) * 1000,
+            "p95_ms": self._percentile(totals, 0.95) * 1000,
+            "max_ms": totals["max"] * 1000,
+            "nodes_per_second": (
+                totals["nodes"] / totals["time"] if totals["time"] else 0.0),
+        }
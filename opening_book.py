@@ -0,0 +1,151 @@
+import argparse
+import mmap
+import os
+import struct
+from tqdm import tqdm
+from board import Board
+from commons import *
+
+
+DEFAULT_BOOK_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+# File layout: a header, then fixed-size records sorted by key
+HEADER = struct.Struct("<4sHH")  # magic, version, plies
+RECORD = struct.Struct("<Qbxh")  # canonical key, best move, score
+MAGIC = b"F4BK"
+VERSION = 1
+
+
+class OpeningBook:
+    """Read-only opening book, memory-mapped from a file.
+
+    Lookups are a binary search over the sorted records of the mapped file,
+    so opening a book costs no parsing and only the pages touched by the
+    searches are read from disk.
+    """
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            raise ValueError(f"Not an opening book: {path}")
+        self._count = (len(self._data) - HEADER.size) // RECORD.size
+
+    def lookup(self, board):
+        """Looks up the position of a board.
+
+        Args:
+            board (Board): The position to look up.
+
+        Returns:
+            tuple: The best move and its score for the player to move, or
+                None if the position is not in the book.
+        """
+        key, mirrored = board.canonical_key()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, score = RECORD.unpack_from(
+                self._data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                if mirrored:
+                    move = COLUMNS - 1 - move
+                return move, score
+        return None
+
+    def close(self):
+        self._data.close()
+
+    def __len__(self):
+        return self._count
+
+
+def load_book(path=DEFAULT_BOOK_PATH):
+    """Opens an opening book, or returns None if the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def book_positions(plies):
+    """Lists the positions with fewer than plies pieces, up to symmetry.
+
+    Args:
+        plies (int): The number of plies covered by the book.
+
+    Returns:
+        dict: Canonical key -> (board, mirrored) of every position that is
+            not over.
+    """
+    positions = {}
+    frontier = [Board()]
+    for _ in range(plies):
+        next_frontier = []
+        for board in frontier:
+            key, mirrored = board.canonical_key()
+            if key in positions:
+                continue
+            positions[key] = (board, mirrored)
+            for col in board.get_valid_moves():
+                child = board.copy()
+                child.make_move(col)
+                if not child.is_gameover():
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return positions
+
+
+def generate_book(path, plies, strategy):
+    """Searches every opening position and writes the book file.
+
+    Args:
+        path (str): The book file to write.
+        plies (int): The number of plies covered by the book.
+        strategy: The strategy choosing the moves. It must set a `score`
+            attribute for the move played, like MinimaxStrategy.
+
+    Returns:
+        int: The number of positions in the book.
+    """
+    records = []
+    for key, (board, mirrored) in tqdm(
+            sorted(book_positions(plies).items()), desc="Positions"):
+        strategy.set_player_side(board.current_player)
+        move = strategy.play(board)
+        if mirrored:
+            move = COLUMNS - 1 - move
+        records.append(RECORD.pack(key, move, int(strategy.score)))
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, plies))
+        file.writelines(records)
+    return len(records)
+
+
+def main():
+    from players.minimax_strategy import MinimaxStrategy
+
+    parser = argparse.ArgumentParser(
+        description="Generate the opening book.")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="Plies covered by the book (default: 4).")
+    parser.add_argument("--depth", type=int, default=8,
+                        help="Minimax search depth (default: 8).")
+    parser.add_argument("--output", type=str, default=DEFAULT_BOOK_PATH,
+                        help="Book file to write.")
+    args = parser.parse_args()
+
+    count = generate_book(
+        args.output, args.plies, MinimaxStrategy(depth=args.depth))
+    print(f"Wrote {count} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
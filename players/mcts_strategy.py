@@ -0,0 +1,227 @@
+import math
+import random
+import time
+from commons import RESULT_DRAW
+from move_stats import MoveStats, record_stats
+
+
+class _Node:
+    """A node of the search tree, reached by playing move."""
+
+    __slots__ = ("move", "player", "parent", "children", "untried",
+                 "visits", "wins")
+
+    def __init__(self, move, player, parent, untried):
+        self.move = move
+        # The player who made the move, whose wins are counted
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        # Won playouts for player, draws counting one half
+        self.wins = 0.0
+
+
+class MCTSStrategy:
+    def __init__(self, playouts=2000, time_ms=None, max_nodes=200_000,
+                 exploration=math.sqrt(2)):
+        self.name = "MCTS Strategy"
+        # Playouts per move, or wall-clock budget per move if time_ms is set
+        self.playouts = playouts
+        self.time_ms = time_ms
+        # Once the tree holds max_nodes nodes it stops growing
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.player_side = None
+        self._root = None
+        self._root_moves = None
+        self._node_count = 0
+        # Search statistics of the last call to play: every playout counts as
+        # a node and a leaf evaluation, the playouts kept from the previous
+        # tree as cache hits, and the depth is that of the deepest expansion
+        self.stats = MoveStats()
+
+    def set_player_side(self, player):
+        self.player_side = player
+        # New game: the tree of the previous one is of no use
+        self._root = None
+        self._root_moves = None
+        self._node_count = 0
+
+    @record_stats
+    def play(self, board):
+        """
+        Plays a move using UCT Monte Carlo Tree Search.
+
+        Immediate wins and blocks are played without searching. The subtree
+        under the moves played since the previous call is kept, so its
+        playouts are not lost.
+
+        Args:
+            board (Board): The current state of the board.
+
+        Returns:
+            int: The column to play in.
+        """
+        available_columns = board.get_valid_moves()
+        for col in available_columns:
+            if board.is_winning_move(col):
+                return self._forced_move(board, col)
+        opponent = 3 - board.current_player
+        for col in available_columns:
+            if board.is_winning_move(col, opponent):
+                return self._forced_move(board, col)
+
+        root = self._reuse_root(board)
+        stats = self.stats
+        stats.cache_hits = root.visits
+        stats.depth = 0
+        if self.time_ms is not None:
+            deadline = time.perf_counter() + self.time_ms / 1000
+        while True:
+            depth = self._run_playout(board, root)
+            stats.nodes += 1
+            if depth > stats.depth:
+                stats.depth = depth
+            if self.time_ms is not None:
+                if time.perf_counter() > deadline:
+                    break
+            elif stats.nodes >= self.playouts:
+                break
+        stats.leaf_evals = stats.nodes
+
+        best = max(root.children, key=lambda child: child.visits)
+        self._set_root(best, board.moves + [best.move])
+        return best.move
+
+    def _forced_move(self, board, col):
+        """Plays a move found without searching, keeping the tree in sync."""
+        root = self._reuse_root(board)
+        for child in root.children:
+            if child.move == col:
+                self._set_root(child, board.moves + [col])
+                return col
+        self._root = None
+        self._root_moves = None
+        return col
+
+    def _reuse_root(self, board):
+        """
+        Finds the node of the current position in the tree of the previous
+        move, or starts a new tree.
+
+        Args:
+            board (Board): The current state of the board.
+
+        Returns:
+            _Node: The root of the search.
+        """
+        node = None
+        known = self._root_moves
+        # The tree can only be matched against a board with its full history
+        if (self._root is not None
+                and len(board.moves) == board.move_count
+                and board.moves[:len(known)] == known):
+            node = self._root
+            for move in board.moves[len(known):]:
+                node = next(
+                    (child for child in node.children if child.move == move),
+                    None)
+                if node is None:
+                    break
+
+        if node is None:
+            node = _Node(
+                None, 3 - board.current_player, None,
+                board.get_valid_moves())
+            self._set_root(node, list(board.moves))
+            self._node_count = 1
+        else:
+            self._set_root(node, list(board.moves))
+            self._node_count = self._count_nodes(node)
+        return node
+
+    def _set_root(self, node, moves):
+        # Detach the node so the rest of the old tree can be freed
+        node.parent = None
+        self._root = node
+        self._root_moves = moves
+
+    def _count_nodes(self, node):
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+    def _run_playout(self, board, root):
+        """
+        Runs one selection, expansion, playout and backpropagation step.
+        Moves are made and taken back on the board itself.
+
+        Args:
+            board (Board): The board at the root of the tree.
+            root (_Node): The root of the tree.
+
+        Returns:
+            int: The number of moves made in the tree before the playout.
+        """
+        node = root
+        path_length = 0
+
+        # Selection
+        while not node.untried and node.children:
+            node = self._select_child(node)
+            board.make_move(node.move)
+            path_length += 1
+
+        # Expansion
+        if node.untried and self._node_count < self.max_nodes:
+            move = node.untried.pop(random.randrange(len(node.untried)))
+            player = board.current_player
+            board.make_move(move)
+            path_length += 1
+            untried = [] if board.is_gameover() else board.get_valid_moves()
+            child = _Node(move, player, node, untried)
+            node.children.append(child)
+            node = child
+            self._node_count += 1
+
+        # Playout
+        playout_length = 0
+        while not board.is_gameover():
+            board.make_move(random.choice(board.get_valid_moves()))
+            playout_length += 1
+        result = board.get_game_result()
+        for _ in range(playout_length + path_length):
+            board.undo_move()
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if result == node.player:
+                node.wins += 1
+            elif result == RESULT_DRAW:
+                node.wins += 0.5
+            node = node.parent
+        return path_length
+
+    def _select_child(self, node):
+        """Picks the child with the highest UCB1 score."""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        best_score = -1.0
+        best_child = None
+        for child in node.children:
+            score = (child.wins / child.visits
+                     + exploration * math.sqrt(log_visits / child.visits))
+            if score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+    def __str__(self):
+        return self.name
@@ -1,72 +1,513 @@
+import multiprocessing
 import random
-from board import Board
+import time
+from commons import COLUMNS, ROWS
+from evaluation import evaluate, evaluate_children
+from move_stats import MoveStats, record_stats
+from opening_book import OpeningBook
+from position_cache import PositionCache
+from transposition_table import (
+    EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable)
+
+
+# Columns from the center outwards: central moves take part in more lines,
+# so they are searched first
+CENTER_ORDER = sorted(range(COLUMNS), key=lambda col: abs(col - COLUMNS // 2))
+
+# Score of a won game
+WIN_SCORE = 1000
+
+# Scores in the position cache are relative to the player to move; seen
+# from the other player a lower bound becomes an upper bound
+_FLIPPED_BOUND = {
+    EXACT: EXACT, LOWER_BOUND: UPPER_BOUND, UPPER_BOUND: LOWER_BOUND}
+
+# Namespace of the cached scores, to be changed with the evaluation
+CACHE_NAMESPACE = "minimax-v1"
+
+
+# Shallowest search handed to the worker pool; below it the serial search
+# is faster than sending the subtrees to the workers
+PARALLEL_MIN_DEPTH = 5
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+
+# Strategy searching the subtrees in a worker process of the pool
+_worker_strategy = None
+
+
+def _init_worker(options):
+    global _worker_strategy
+    _worker_strategy = MinimaxStrategy(**options)
+
+
+def _search_subtree(board, player_side, depth, alpha):
+    """
+    Searches the subtree of a root move in a worker process. The worker
+    keeps its transposition table across tasks while it plays the same
+    side, so later tasks reuse the positions of earlier ones.
+
+    Args:
+        board (Board): The board after the root move.
+        player_side (int): The side the score is relative to.
+        depth (int): Depth to search in the game tree.
+        alpha (float): Score of the best root move searched so far; a
+            subtree that cannot beat it is cut off as early as possible.
+
+    Returns:
+        tuple: The score of the subtree, exact if above alpha and at most
+            alpha otherwise, and the MoveStats of the search.
+    """
+    strategy = _worker_strategy
+    if strategy.player_side != player_side:
+        strategy.set_player_side(player_side)
+    if strategy.tt is not None:
+        strategy.tt.new_search()
+    strategy.stats.reset()
+    value = strategy._minimax(
+        board, depth, board.current_player == player_side, alpha,
+        float('inf'))
+    if strategy.cache is not None:
+        strategy.cache.flush()
+    return value, strategy.stats
 
 
 class MinimaxStrategy:
-    def __init__(self, depth=4):
+    def __init__(self, depth=4, alpha_beta=True, tt_size=1 << 18,
+                 time_ms=None, heuristic=True, workers=None, book=None,
+                 cache=None, cache_depth=3):
+        if workers is not None and time_ms is not None:
+            raise ValueError("Parallel search needs a fixed depth, not time_ms")
+
         self.name = "Minimax Strategy"
         self.depth = depth
+        self.alpha_beta = alpha_beta
+        # Score the positions that are not over with evaluation.evaluate
+        # instead of as draws
+        self.heuristic = heuristic
+        # With a time budget per move the depth is not fixed: the search is
+        # deepened until the budget runs out
+        self.time_ms = time_ms
+        self._deadline = None
+        # Node count at which the clock is read next
+        self._next_check = 0
+        # threading.Event set by another thread to stop a time-limited
+        # search early, as if the budget had run out
+        self.stop_event = None
+        # Scores are cached by position; tt_size=0 disables the table
+        self.tt = TranspositionTable(tt_size) if tt_size else None
+        # Path of an opening book consulted before searching
+        self.book = OpeningBook(book) if book else None
+        # Number of processes searching the root moves after the first in
+        # parallel, from depth PARALLEL_MIN_DEPTH
+        self.workers = workers
+        self._pool = None
+        self._worker_options = dict(
+            depth=depth, alpha_beta=alpha_beta, tt_size=tt_size,
+            heuristic=heuristic, cache_depth=cache_depth)
+        # Persistent cache behind the transposition table, for the nodes
+        # searched at least cache_depth plies deep
+        self.cache = None
+        self.cache_depth = cache_depth
+        if cache:
+            self.open_cache(cache)
         self.player_side = None
+        # Search statistics, depth completed and score of the move played by
+        # the last call to play
+        self.stats = MoveStats()
+        self.depth_reached = None
+        self.score = None
+
+    def open_cache(self, path):
+        """
+        Uses a persistent position cache as a second level behind the
+        transposition table.
+
+        Args:
+            path (str): The SQLite file of the cache, created if missing.
+        """
+        mode = "heuristic" if self.heuristic else "plain"
+        self.cache = PositionCache(path, f"{CACHE_NAMESPACE}/{mode}")
+        self._worker_options["cache"] = path
 
     def set_player_side(self, player):
         self.player_side = player
+        # Stored scores are relative to the side we play
+        if self.tt is not None:
+            self.tt.clear()
 
+    @record_stats
     def play(self, board):
         """
         Plays a move using the Minimax algorithm.
 
+        Positions found in the opening book are played without searching.
+        Otherwise, with alpha-beta pruning enabled or a time budget, the search
+        is deepened one ply at a time, and every iteration tries the best
+        move of the previous one first. When the time budget runs out, the
+        best move of the deepest completed iteration is played.
+
         Args:
             board (Board): The current state of the board.
 
         Returns:
             int: The column to play in.
         """
-        best_move = None
-        best_value = -float('inf')
+        self.depth_reached = None
+        self.score = None
+        if self.book is not None:
+            entry = self.book.lookup(board)
+            if entry is not None and board.is_valid_move(entry[0]):
+                move, self.score = entry
+                return move
+
+        if self.tt is not None:
+            self.tt.new_search()
         available_columns = board.get_valid_moves()
         # Introduce randomness among equally valued moves
         random.shuffle(available_columns)
 
+        if self.workers is not None and self.depth >= PARALLEL_MIN_DEPTH:
+            return self._parallel_search_root(board, available_columns)
+
+        if self.time_ms is not None:
+            self._deadline = time.perf_counter() + self.time_ms / 1000
+            self._next_check = 0
+            depths = range(ROWS * COLUMNS - board.move_count)
+        elif self.alpha_beta:
+            depths = range(self.depth + 1)
+        else:
+            depths = [self.depth]
+
+        best_move = None
+        start_count = board.move_count
+        try:
+            for depth in depths:
+                best_move, best_value = self._search_root(
+                    board, available_columns, depth, best_move)
+                self.depth_reached = self.stats.depth = depth
+                self.score = best_value
+                # A won or lost game does not change with more depth
+                if self._deadline is not None and abs(best_value) >= WIN_SCORE:
+                    break
+        except _SearchTimeout:
+            # Take back the moves of the interrupted search
+            while board.move_count > start_count:
+                board.undo_move()
+        finally:
+            self._deadline = None
+            if self.cache is not None:
+                self.cache.flush()
+
+        if best_move is None:
+            best_move = available_columns[0]
+        return best_move
+
+    def _search_root(self, board, available_columns, depth, previous_best=None):
+        """
+        Searches every available move and returns the best one.
+
+        Args:
+            board (Board): The current state of the board.
+            available_columns (list): The moves to search, in random order.
+            depth (int): Depth to search below each move.
+            previous_best (int, optional): Best move of the previous
+                iteration, searched right after winning and blocking moves.
+
+        Returns:
+            tuple: The column to play in and its score.
+        """
+        if self.alpha_beta:
+            available_columns = self._order_root_moves(
+                board, available_columns, previous_best)
+
+        best_move = None
+        best_value = -float('inf')
         for col in available_columns:
-            temp_board = self._simulate_move(board, col, board.current_player)
-            move_value = self._minimax(temp_board, self.depth, False)
+            board.make_move(col)
+            move_value = self._minimax(
+                board, depth, False, best_value, float('inf'))
+            board.undo_move()
             if move_value > best_value:
                 best_value = move_value
                 best_move = col
 
+        return best_move, best_value
+
+    def _parallel_search_root(self, board, available_columns):
+        """
+        Searches every available move with a PV split. The shallower
+        iterations and the first root move are searched serially, filling
+        the transposition table and giving the move ordering; the score of
+        the first move then serves as alpha for the other root moves, which
+        are searched in parallel by the worker pool. The pool is started on
+        the first call and reused afterwards.
+
+        Args:
+            board (Board): The current state of the board.
+            available_columns (list): The moves to search, in random order.
+
+        Returns:
+            int: The column to play in.
+        """
+        best_move = None
+        depths = range(self.depth) if self.alpha_beta else []
+        for depth in depths:
+            best_move, _ = self._search_root(
+                board, available_columns, depth, best_move)
+        if self.alpha_beta:
+            available_columns = self._order_root_moves(
+                board, available_columns, best_move)
+
+        # The principal variation, searched serially with a full window
+        best_move = available_columns[0]
+        board.make_move(best_move)
+        best_value = self._minimax(board, self.depth, False)
+        board.undo_move()
+
+        others = available_columns[1:]
+        if others:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    self.workers, _init_worker, (self._worker_options,))
+            alpha = best_value if self.alpha_beta else -float('inf')
+            tasks = []
+            for col in others:
+                board.make_move(col)
+                tasks.append(
+                    (board.copy(), self.player_side, self.depth, alpha))
+                board.undo_move()
+            results = self._pool.starmap(_search_subtree, tasks)
+            for col, (value, stats) in zip(others, results):
+                self.stats.add(stats)
+                if value > best_value:
+                    best_value = value
+                    best_move = col
+
+        if self.cache is not None:
+            self.cache.flush()
+        self.depth_reached = self.stats.depth = self.depth
+        self.score = best_value
         return best_move
 
-    def _minimax(self, board, depth, is_maximizing):
+    def close(self):
+        """
+        Stops the worker processes of the parallel search and closes the
+        position cache.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def _minimax(self, board, depth, is_maximizing,
+                 alpha=-float('inf'), beta=float('inf')):
         """
-        Minimax algorithm to evaluate the best move.
+        Minimax algorithm to evaluate the best move. Moves are made and
+        taken back on the board itself, which is left unchanged.
 
         Args:
             board (Board): The current state of the board.
             depth (int): Depth to search in the game tree.
             is_maximizing (bool): True if maximizing player's turn, False otherwise.
+            alpha (float): Score the maximizing player is already assured of.
+            beta (float): Score the minimizing player is already assured of.
 
         Returns:
             float: The evaluation score for the current board state.
         """
+        stats = self.stats
+        stats.nodes += 1
+        # A threshold rather than a multiple of 256: the batched leaves
+        # raise the count by several nodes at once
+        if self._deadline is not None and stats.nodes >= self._next_check:
+            self._next_check = stats.nodes + 256
+            if (time.perf_counter() > self._deadline
+                    or self.stop_event is not None
+                    and self.stop_event.is_set()):
+                raise _SearchTimeout()
+
         if depth == 0 or board.is_gameover():
+            stats.leaf_evals += 1
             return self._evaluate_board(board)
 
-        if is_maximizing:
-            max_eval = -float('inf')
-            for col in board.get_valid_moves():
-                temp_board = self._simulate_move(
-                    board, col, board.current_player)
-                eval = self._minimax(temp_board, depth - 1, False)
-                max_eval = max(max_eval, eval)
-            return max_eval
+        key = None
+        tt_move = None
+        entry = None
+        if self.tt is not None:
+            key = board.key()
+            entry = self.tt.lookup(key)
+            if entry is not None:
+                entry = entry[1:5]
+        use_cache = self.cache is not None and depth >= self.cache_depth
+        if use_cache and (entry is None or entry[0] < depth):
+            # Earlier iterations leave shallower entries in the table
+            cached = self._cache_lookup(board)
+            if cached is not None and (entry is None or cached[0] > entry[0]):
+                entry = cached
+        if entry is not None:
+            stats.cache_hits += 1
+            entry_depth, bound, value, tt_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER_BOUND and value >= beta:
+                    return value
+                if bound == UPPER_BOUND and value <= alpha:
+                    return value
+
+        if self.alpha_beta:
+            moves = self._order_moves(board, tt_move)
+        else:
+            moves = board.get_valid_moves()
+
+        alpha_start, beta_start = alpha, beta
+        best_move = None
+        if depth == 1 and self.heuristic:
+            # Score all the children in one vectorized call
+            scores = self._evaluate_children(board, moves)
+            stats.nodes += len(moves)
+            stats.leaf_evals += len(moves)
+            pick = max if is_maximizing else min
+            best_index = pick(range(len(moves)), key=scores.__getitem__)
+            best_eval = scores[best_index]
+            best_move = moves[best_index]
+        elif is_maximizing:
+            best_eval = -float('inf')
+            for col in moves:
+                board.make_move(col)
+                eval = self._minimax(board, depth - 1, False, alpha, beta)
+                board.undo_move()
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = col
+                if self.alpha_beta:
+                    alpha = max(alpha, eval)
+                    if alpha >= beta:
+                        stats.prunes += 1
+                        break
         else:
-            min_eval = float('inf')
-            opponent = 3 - board.current_player
-            for col in board.get_valid_moves():
-                temp_board = self._simulate_move(board, col, opponent)
-                eval = self._minimax(temp_board, depth - 1, True)
-                min_eval = min(min_eval, eval)
-            return min_eval
+            best_eval = float('inf')
+            for col in moves:
+                board.make_move(col)
+                eval = self._minimax(board, depth - 1, True, alpha, beta)
+                board.undo_move()
+                if eval < best_eval:
+                    best_eval = eval
+                    best_move = col
+                if self.alpha_beta:
+                    beta = min(beta, eval)
+                    if alpha >= beta:
+                        stats.prunes += 1
+                        break
+
+        if key is not None or use_cache:
+            if best_eval <= alpha_start:
+                bound = UPPER_BOUND
+            elif best_eval >= beta_start:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            if key is not None:
+                self.tt.store(key, depth, bound, best_eval, best_move)
+            if use_cache:
+                self._cache_store(board, depth, bound, best_eval, best_move)
+        return best_eval
+
+    def _cache_lookup(self, board):
+        """
+        Looks up the current position in the persistent cache.
+
+        Args:
+            board (Board): The current state of the board.
+
+        Returns:
+            tuple: (depth, bound, value, move) relative to the side we play,
+                or None if the position is not cached.
+        """
+        cache_key, mirrored = board.canonical_key()
+        entry = self.cache.lookup(cache_key)
+        if entry is None:
+            return None
+        depth, bound, value, move = entry
+        if board.current_player != self.player_side:
+            value = -value
+            bound = _FLIPPED_BOUND[bound]
+        if mirrored and move is not None:
+            move = COLUMNS - 1 - move
+        return depth, bound, value, move
+
+    def _cache_store(self, board, depth, bound, value, move):
+        """
+        Stores the score of the current position in the persistent cache,
+        relative to the player to move and shared with the mirrored position.
+        """
+        cache_key, mirrored = board.canonical_key()
+        if board.current_player != self.player_side:
+            value = -value
+            bound = _FLIPPED_BOUND[bound]
+        if mirrored and move is not None:
+            move = COLUMNS - 1 - move
+        self.cache.store(cache_key, depth, bound, value, move)
+
+    def _order_moves(self, board, first=None):
+        """
+        Orders the valid moves so that the most promising are searched
+        first: immediate wins, then the given move, then blocks of the
+        opponent's wins, then the remaining columns from the center outwards.
+
+        Args:
+            board (Board): The current state of the board.
+            first (int, optional): The best move of an earlier search.
+
+        Returns:
+            list: The valid moves, in search order.
+        """
+        opponent = 3 - board.current_player
+        wins, blocks, others = [], [], []
+        for col in CENTER_ORDER:
+            if not board.is_valid_move(col):
+                continue
+            if board.is_winning_move(col):
+                wins.append(col)
+            elif col == first:
+                blocks.insert(0, col)
+            elif board.is_winning_move(col, opponent):
+                blocks.append(col)
+            else:
+                others.append(col)
+        return wins + blocks + others
+
+    def _order_root_moves(self, board, available_columns, previous_best):
+        """
+        Orders the root moves: immediate wins, blocks and the previous best
+        move first. The other moves keep their random order, so that equally
+        valued moves are still picked at random.
+
+        Args:
+            board (Board): The current state of the board.
+            available_columns (list): The valid moves, in random order.
+            previous_best (int): Best move of the previous iteration, or None.
+
+        Returns:
+            list: The valid moves, in search order.
+        """
+        opponent = 3 - board.current_player
+
+        def priority(col):
+            if board.is_winning_move(col):
+                return 0
+            if board.is_winning_move(col, opponent):
+                return 1
+            if col == previous_best:
+                return 2
+            return 3
+
+        return sorted(available_columns, key=priority)
 
     def _evaluate_board(self, board):
         """
@@ -78,29 +519,37 @@ class MinimaxStrategy:
         Returns:
             float: The evaluation score.
         """
-        if board.get_game_result() == self.player_side:
-            return 1000
-        elif board.get_game_result() == (3 - self.player_side):
-            return -1000
-        return 0
+        result = board.get_game_result()
+        if result == self.player_side:
+            return WIN_SCORE
+        elif result == (3 - self.player_side):
+            return -WIN_SCORE
+        elif result is not None or not self.heuristic:
+            return 0
+        return evaluate(board, self.player_side)
 
-    def _simulate_move(self, board, col, player):
+    def _evaluate_children(self, board, moves):
         """
-        Simulates a move on a temporary board to evaluate its outcome.
+        Evaluates the board states after each of the given moves, scoring
+        the positions that are not over in a single batch.
 
         Args:
-            board (Board): The current board state.
-            col (int): The column to simulate the move in.
-            player (int): The player making the move.
+            board (Board): The current state of the board.
+            moves (list): The valid moves to evaluate.
 
         Returns:
-            Board: A new board instance with the move applied.
+            list: The evaluation score after each move.
         """
-        temp_board = Board()
-        temp_board.grid = [row[:] for row in board.grid]
-        temp_board.current_player = player
-        temp_board.make_move(col)
-        return temp_board
+        scores = evaluate_children(board, self.player_side, moves).tolist()
+        win_score = (
+            WIN_SCORE if board.current_player == self.player_side
+            else -WIN_SCORE)
+        for i, col in enumerate(moves):
+            if board.is_winning_move(col):
+                scores[i] = win_score
+            elif board.move_count + 1 == ROWS * COLUMNS:
+                scores[i] = 0
+        return scores
 
     def __str__(self):
         return self.name
@@ -0,0 +1,85 @@
+import random
+import numpy as np
+from batch_board import random_playouts
+from commons import RESULT_DRAW, ROWS, COLUMNS
+from move_stats import MoveStats, record_stats
+
+
+class MonteCarloStrategy:
+    def __init__(self, simulations=1000, seed=None):
+        self.name = "Monte Carlo Strategy"
+        # Random games played after each move, fewer towards the end of the
+        # game where they are shorter and less varied
+        self.simulations = simulations
+        # The playouts are seeded from the random module, which the match
+        # runner seeds per game; an explicit seed overrides it
+        self.rng = np.random.default_rng(seed) if seed is not None else None
+        self.player_side = None
+        # Search statistics of the last call to play: every random game
+        # counts as a node and a leaf evaluation
+        self.stats = MoveStats()
+
+    def set_player_side(self, player):
+        self.player_side = player
+
+    @record_stats
+    def play(self, board):
+        """
+        Plays the move whose random playouts score best: immediate wins and
+        blocks first, otherwise each move is followed by a batch of random
+        games, counting the wins and half the draws.
+
+        Args:
+            board (Board): The current state of the board.
+
+        Returns:
+            int: The column to play in.
+        """
+        player = board.current_player
+        opponent = 3 - player
+        available_columns = board.get_valid_moves()
+        for col in available_columns:
+            if board.is_winning_move(col):
+                return col
+        for col in available_columns:
+            if board.is_winning_move(col, opponent):
+                return col
+
+        simulations = self._simulations(board)
+        self.stats.depth = 1
+        scores = []
+        for col in available_columns:
+            board.make_move(col)
+            if board.is_gameover():
+                # The board is full: the move draws
+                scores.append(0.5 * simulations)
+            else:
+                results = random_playouts(
+                    board.grid, opponent, simulations,
+                    seed=self._playout_seed())
+                scores.append(
+                    np.sum(results == player)
+                    + 0.5 * np.sum(results == RESULT_DRAW))
+                self.stats.nodes += simulations
+                self.stats.leaf_evals += simulations
+            board.undo_move()
+
+        return available_columns[int(np.argmax(scores))]
+
+    def _playout_seed(self):
+        """Returns the seed of the next batch of playouts."""
+        if self.rng is not None:
+            return self.rng.integers(2**32)
+        return random.getrandbits(32)
+
+    def _simulations(self, board):
+        """Returns the number of playouts per move for the position."""
+        remaining_moves = ROWS * COLUMNS - board.move_count
+        if remaining_moves > 20:
+            return self.simulations
+        if remaining_moves > 10:
+            return min(self.simulations, 500)
+        return min(self.simulations, 100)
+
+    def __str__(self):
+        return self.name
@@ -1,16 +1,23 @@
 import random
+from move_stats import MoveStats, record_stats
 
 
 class RandomStrategy:
     def __init__(self):
         self.name = "Random Strategy"
         self.player_side = None
+        self.stats = MoveStats()
 
     def set_player_side(self, player):
         self.player_side = player
 
+    @record_stats
     def play(self, board):
         return random.choice(board.get_valid_moves())
 
+    def play_batch(self, boards):
+        """Plays a random valid move in every game of a BatchBoard."""
+        return boards.random_moves()
+
     def __str__(self):
         return self.name
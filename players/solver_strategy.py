@@ -0,0 +1,289 @@
+import time
+from board import BOARD_MASK, BOTTOM_MASK, COLUMN_HEIGHT
+from commons import COLUMNS, ROWS
+from move_stats import MoveStats, record_stats
+from players.minimax_strategy import (
+    CENTER_ORDER, MinimaxStrategy, _SearchTimeout)
+from transposition_table import LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+
+# Scores follow the usual convention for solved Connect Four positions: a
+# win with the last stone is worth 1, every stone the winner saves adds 1,
+# and losses are the negated scores of the opponent's wins. A draw is 0.
+BOARD_SIZE = ROWS * COLUMNS
+COLUMN_MASKS = [
+    ((1 << ROWS) - 1) << (col * COLUMN_HEIGHT) for col in range(COLUMNS)]
+
+
+def _winning_cells(position, mask):
+    """
+    Finds the empty cells that would complete a 4 in a row.
+
+    Args:
+        position (int): The bitboard of the player.
+        mask (int): The bitboard of all the pieces.
+
+    Returns:
+        int: The bitboard of the winning cells, playable or not.
+    """
+    # Vertical
+    cells = (position << 1) & (position << 2) & (position << 3)
+    for shift in (COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        pair = (position << shift) & (position << (2 * shift))
+        cells |= pair & (position << (3 * shift))
+        cells |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> (2 * shift))
+        cells |= pair & (position << shift)
+        cells |= pair & (position >> (3 * shift))
+    return cells & (BOARD_MASK ^ mask)
+
+
+class SolverStrategy:
+    def __init__(self, time_ms=2000, weak=False, tt_size=1 << 20,
+                 fallback_ms=500):
+        self.name = "Solver Strategy"
+        # Budget for solving a move; when it runs out the move is chosen by a
+        # heuristic search of fallback_ms instead
+        self.time_ms = time_ms
+        self.fallback = MinimaxStrategy(time_ms=fallback_ms)
+        # A weak solve only tells wins, draws and losses apart
+        self.weak = weak
+        # Bounds are stored by position and stay valid across moves and games
+        self.tt = TranspositionTable(tt_size)
+        self.player_side = None
+        self._deadline = None
+        # Results of the last call to play: solved score, distance to the end
+        # of the game in plies (positive for a win, negative for a loss) and
+        # search statistics, including those of the fallback search. A weak
+        # solve only scores the outcome, 1, 0 or -1, without a distance
+        self.exact = False
+        self.score = None
+        self.distance = None
+        self.stats = MoveStats()
+
+    def set_player_side(self, player):
+        self.player_side = player
+        self.fallback.set_player_side(player)
+
+    @record_stats
+    def play(self, board):
+        """
+        Plays the move with the best solved score. If the position cannot be
+        solved within the time budget, the fallback search picks the move.
+
+        Args:
+            board (Board): The current state of the board.
+
+        Returns:
+            int: The column to play in.
+        """
+        self.exact = False
+        self.score = None
+        self.distance = None
+        if self.time_ms is not None:
+            self._deadline = time.perf_counter() + self.time_ms / 1000
+
+        position = board.masks[board.current_player]
+        mask = board.masks[1] | board.masks[2]
+        moves = board.move_count
+        try:
+            best_move, best_score = self._solve_root(position, mask, moves)
+            self.exact = True
+            if self.weak:
+                self.score = (best_score > 0) - (best_score < 0)
+            else:
+                self.score = best_score
+                self.distance = self._distance(best_score, moves)
+            # Solved positions are searched to the end of the game
+            self.stats.depth = BOARD_SIZE - moves
+        except _SearchTimeout:
+            best_move = None
+        finally:
+            self._deadline = None
+
+        if best_move is None:
+            best_move = self.fallback.play(board)
+            self.stats.add(self.fallback.stats)
+        return best_move
+
+    def solve(self, board):
+        """
+        Solves the position of a board, without a time limit.
+
+        Args:
+            board (Board): The position to solve.
+
+        Returns:
+            int: The score of the position for the player to move.
+        """
+        return self._solve(
+            board.masks[board.current_player],
+            board.masks[1] | board.masks[2],
+            board.move_count)
+
+    def _solve_root(self, position, mask, moves):
+        """
+        Solves every move of the position.
+
+        Returns:
+            tuple: The best move and its score.
+        """
+        best_move = None
+        best_score = -BOARD_SIZE
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        for col in CENTER_ORDER:
+            move = possible & COLUMN_MASKS[col]
+            if not move:
+                continue
+            if _winning_cells(position, mask) & move:
+                return col, (BOARD_SIZE + 1 - moves) // 2
+            score = -self._solve(position ^ mask, mask | move, moves + 1)
+            if score > best_score:
+                best_score = score
+                best_move = col
+        return best_move, best_score
+
+    def _solve(self, position, mask, moves):
+        """
+        Finds the exact score of a position with a sequence of null-window
+        searches, narrowing the score range at every step.
+
+        Args:
+            position (int): The bitboard of the player to move.
+            mask (int): The bitboard of all the pieces.
+            moves (int): The number of pieces on the board.
+
+        Returns:
+            int: The score of the position for the player to move.
+        """
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        if _winning_cells(position, mask) & possible:
+            return (BOARD_SIZE + 1 - moves) // 2
+
+        if self.weak:
+            low, high = -1, 1
+        else:
+            low = -((BOARD_SIZE - moves) // 2)
+            high = (BOARD_SIZE + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            # Probe closer to 0 first: those searches are the cheapest
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and int(high / 2) > middle:
+                middle = int(high / 2)
+            score = self._negamax(position, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def _negamax(self, position, mask, moves, alpha, beta):
+        """
+        Negamax search with alpha-beta pruning. The player to move must not
+        be able to win with their next move.
+
+        Args:
+            position (int): The bitboard of the player to move.
+            mask (int): The bitboard of all the pieces.
+            moves (int): The number of pieces on the board.
+            alpha (int): Score the player to move is already assured of.
+            beta (int): Score the opponent is already assured of.
+
+        Returns:
+            int: The score of the position, exact if it lies between alpha
+                and beta, otherwise a bound on the failing side.
+        """
+        stats = self.stats
+        stats.nodes += 1
+        if (self._deadline is not None and stats.nodes & 1023 == 0
+                and time.perf_counter() > self._deadline):
+            raise _SearchTimeout()
+
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponent_wins = _winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            # Two threats cannot both be blocked
+            if forced & (forced - 1):
+                stats.leaf_evals += 1
+                return -((BOARD_SIZE - moves) // 2)
+            possible = forced
+        # Playing under an opponent's winning cell lets them win
+        candidates = possible & ~(opponent_wins >> 1)
+        if not candidates:
+            stats.leaf_evals += 1
+            return -((BOARD_SIZE - moves) // 2)
+        if moves >= BOARD_SIZE - 2:
+            stats.leaf_evals += 1
+            return 0
+
+        # The opponent cannot win with their next move
+        low = -((BOARD_SIZE - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                stats.prunes += 1
+                return alpha
+        # We cannot win with this move
+        high = (BOARD_SIZE - 1 - moves) // 2
+
+        key = position + mask
+        entry = self.tt.lookup(key)
+        if entry is not None:
+            stats.cache_hits += 1
+            _, _, bound, value, _, _ = entry
+            if bound == LOWER_BOUND:
+                if alpha < value:
+                    alpha = value
+                    if alpha >= beta:
+                        stats.prunes += 1
+                        return alpha
+            elif value < high:
+                high = value
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                stats.prunes += 1
+                return beta
+
+        # Moves creating more threats first, then from the center outwards
+        ordered = []
+        for col in CENTER_ORDER:
+            move = candidates & COLUMN_MASKS[col]
+            if move:
+                threats = _winning_cells(position | move, mask).bit_count()
+                ordered.append((threats, move))
+        ordered.sort(key=lambda item: -item[0])
+
+        opponent = position ^ mask
+        for _, move in ordered:
+            score = -self._negamax(
+                opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                stats.prunes += 1
+                self.tt.store(key, 0, LOWER_BOUND, score, None)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.tt.store(key, 0, UPPER_BOUND, alpha, None)
+        return alpha
+
+    def _distance(self, score, moves):
+        """
+        Converts a score into the number of plies until the end of the game
+        with best play: positive for a win, negative for a loss, 0 for a draw.
+        """
+        if score == 0:
+            return 0
+        if score > 0:
+            # Stones we still have to play, the last one winning
+            remaining = (BOARD_SIZE // 2 + 1 - score) - moves // 2
+            return 2 * remaining - 1
+        remaining = (BOARD_SIZE // 2 + 1 + score) - (moves + 1) // 2
+        return -2 * remaining
+
+    def __str__(self):
+        return self.name
@@ -1,15 +1,20 @@
 import random
-from board import Board
+import numpy as np
+from move_stats import MoveStats, record_stats
 
 
 class WinnowOrRandomStrategy:
     def __init__(self):
         self.name = "Winnow or Random Strategy"
         self.player_side = None
+        # Search statistics of the last call to play: every move tried
+        # counts as a node and a leaf evaluation
+        self.stats = MoveStats()
 
     def set_player_side(self, player):
         self.player_side = player
 
+    @record_stats
     def play(self, board):
         """
         Plays a move by prioritizing winning or blocking an opponent's win.
@@ -21,39 +26,64 @@ class WinnowOrRandomStrategy:
         Returns:
             int: The column to play in.
         """
+        player = board.current_player
+        self.stats.depth = 1
+
         # Try to win
         for col in board.get_valid_moves():
-            temp_board = self._simulate_move(board, col, board.current_player)
-            if temp_board.get_game_result() == board.current_player:
+            if self._is_winning_move(board, col):
                 return col
 
         # Try to block opponent's win
-        opponent = 3 - board.current_player
-        for col in board.get_valid_moves():
-            temp_board = self._simulate_move(board, col, opponent)
-            if temp_board.get_game_result() == opponent:
-                return col
+        board.current_player = 3 - player
+        try:
+            for col in board.get_valid_moves():
+                if self._is_winning_move(board, col):
+                    return col
+        finally:
+            board.current_player = player
 
         # Otherwise, play randomly
         return random.choice(board.get_valid_moves())
 
-    def _simulate_move(self, board, col, player):
+    def play_batch(self, boards):
+        """
+        Plays a move in every game of a BatchBoard, with the same priorities
+        as play: the first winning column, then the first blocking column,
+        then a random one.
+
+        Args:
+            boards (BatchBoard): The games to play in.
+
+        Returns:
+            np.ndarray: The column to play in each game.
+        """
+        players = boards.current_player
+        wins = boards.winning_moves(players)
+        blocks = boards.winning_moves(3 - players)
+        moves = boards.random_moves()
+        moves = np.where(blocks.any(axis=1), blocks.argmax(axis=1), moves)
+        return np.where(wins.any(axis=1), wins.argmax(axis=1), moves)
+
+    def _is_winning_move(self, board, col):
         """
-        Simulates a move on a temporary board to evaluate its outcome.
+        Checks if the current player wins by playing in a column. The move
+        is made and taken back on the board itself.
 
         Args:
             board (Board): The current board state.
-            col (int): The column to simulate the move in.
-            player (int): The player making the move.
+            col (int): The column to try.
 
         Returns:
-            Board: A new board instance with the move applied.
+            bool: True if the move wins the game.
         """
-        temp_board = Board()
-        temp_board.grid = [row[:] for row in board.grid]
-        temp_board.current_player = player
-        temp_board.make_move(col)
-        return temp_board
+        player = board.current_player
+        board.make_move(col)
+        won = board.get_game_result() == player
+        board.undo_move()
+        self.stats.nodes += 1
+        self.stats.leaf_evals += 1
+        return won
 
     def __str__(self):
         return self.name
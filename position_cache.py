@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import time
+
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "position_cache.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    namespace TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    bound INTEGER NOT NULL,
+    value NUMERIC NOT NULL,
+    move INTEGER,
+    stored REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS positions_eviction ON positions (depth, stored);
+"""
+
+# A stored entry is only replaced by one searched at least as deep
+_UPSERT = """
+INSERT INTO positions (namespace, key, depth, bound, value, move, stored)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (namespace, key) DO UPDATE SET
+    depth = excluded.depth, bound = excluded.bound, value = excluded.value,
+    move = excluded.move, stored = excluded.stored
+WHERE excluded.depth >= positions.depth
+"""
+
+
+class PositionCache:
+    """Search results stored in a SQLite file and shared across runs.
+
+    Entries have the same fields as the transposition table, keyed by
+    position within a namespace: searches with different settings must use
+    different namespaces, since their scores are not comparable.
+
+    The database is in WAL mode, so several processes can read it while one
+    of them writes. Stores are buffered and written in a single transaction
+    every batch_size entries, or when flush is called. When the file holds
+    more than max_entries entries, the shallowest and oldest are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, namespace="",
+                 max_entries=1_000_000, batch_size=1000):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._pending = {}
+        self._connection = None
+        self._pid = None
+        # Upper estimate of the number of entries in the file
+        self._count = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        """Opens the database on first use, and again in a forked process."""
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        connection = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        self._connection = connection
+        self._pid = os.getpid()
+        self._count = connection.execute(
+            "SELECT COUNT(*) FROM positions").fetchone()[0]
+        return connection
+
+    def lookup(self, key):
+        """Looks up a position.
+
+        Args:
+            key (int): The key of the position.
+
+        Returns:
+            tuple: (depth, bound, value, move), or None if the position is
+                not stored.
+        """
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._connect().execute(
+                "SELECT depth, bound, value, move FROM positions "
+                "WHERE namespace = ? AND key = ?",
+                (self.namespace, key)).fetchone()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, bound, value, move):
+        """Buffers the result of a search, to be written with the next batch.
+
+        Args:
+            key (int): The key of the position.
+            depth (int): The depth the position was searched to.
+            bound (int): EXACT, LOWER_BOUND or UPPER_BOUND.
+            value (float): The score of the position.
+            move (int): The best move found, or None.
+        """
+        pending = self._pending.get(key)
+        if pending is not None and pending[0] > depth:
+            return
+        self._pending[key] = (depth, bound, value, move)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered entries, then evicts entries over the cap."""
+        if not self._pending:
+            return
+        connection = self._connect()
+        stored = time.time()
+        with connection:
+            connection.executemany(_UPSERT, [
+                (self.namespace, key, depth, bound, value, move, stored)
+                for key, (depth, bound, value, move) in self._pending.items()
+            ])
+        self._count += len(self._pending)
+        self._pending.clear()
+        if self._count > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        connection = self._connection
+        with connection:
+            self._count = connection.execute(
+                "SELECT COUNT(*) FROM positions").fetchone()[0]
+            if self._count > self.max_entries:
+                # Make room for a few batches, not just for the next one
+                excess = self._count - self.max_entries * 9 // 10
+                connection.execute(
+                    "DELETE FROM positions WHERE rowid IN ("
+                    "SELECT rowid FROM positions "
+                    "ORDER BY depth, stored LIMIT ?)", (excess,))
+                self._count -= excess
+                self.evictions += excess
+
+    def close(self):
+        """Writes the buffered entries and closes the database."""
+        self.flush()
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __len__(self):
+        self.flush()
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM positions").fetchone()[0]
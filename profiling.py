@@ -0,0 +1,185 @@
+import cProfile
+import glob
+import io
+import os
+import pstats
+import tempfile
+from multiprocessing import util
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Project files by part of the run; the time of any other code (standard
+# library, NumPy, tqdm, builtins) goes to the part that called it
+BOARD_FILES = {"board.py", "batch_board.py"}
+STRATEGY_FILES = {"evaluation.py", "transposition_table.py",
+                  "position_cache.py", "opening_book.py", "move_stats.py"}
+RUNNER_FILES = {"test_play_games.py", "commons.py", "profiling.py",
+                "progress.py", "game_log.py"}
+CATEGORIES = ("Board", "Strategies", "Runner")
+
+# Profiler of a worker process, dumped when the worker exits
+_worker_profiler = None
+
+
+def _file_category(filename):
+    """Returns the category of a project file, or None for any other file."""
+    path = os.path.abspath(filename)
+    if os.path.dirname(path) == os.path.join(PROJECT_DIR, "players"):
+        return "Strategies"
+    if os.path.dirname(path) != PROJECT_DIR:
+        return None
+    name = os.path.basename(path)
+    if name in BOARD_FILES:
+        return "Board"
+    if name in STRATEGY_FILES:
+        return "Strategies"
+    if name in RUNNER_FILES:
+        return "Runner"
+    return None
+
+
+def start_worker_profiler(directory):
+    """Sets up the profiler of the current worker process.
+
+    Meant for the initializer of a multiprocessing pool. Only the tasks run
+    by run_worker_task are profiled, leaving out the time the worker
+    waits for tasks. The stats are written to a file of the directory when
+    the worker shuts down, which requires closing and joining the pool
+    rather than terminating it.
+
+    Args:
+        directory (str): The directory of the stats files of the workers.
+    """
+    global _worker_profiler
+    _worker_profiler = cProfile.Profile()
+    path = os.path.join(directory, f"worker-{os.getpid()}.pstats")
+    util.Finalize(None, _worker_profiler.dump_stats, (path,), exitpriority=10)
+
+
+def run_profiled(profiler, function, *args, **kwargs):
+    """Calls function, profiling it with profiler unless it is None."""
+    if profiler is None:
+        return function(*args, **kwargs)
+    return profiler.runcall(function, *args, **kwargs)
+
+
+def run_worker_task(function, *args, **kwargs):
+    """Calls function, profiling it if the worker process is profiled."""
+    return run_profiled(_worker_profiler, function, *args, **kwargs)
+
+
+def worker_profile_dir():
+    """Creates a directory for the stats files of profiled workers."""
+    return tempfile.mkdtemp(prefix="forza4-profile-")
+
+
+def merge_worker_profiles(directory, parent=None):
+    """Merges and removes the stats files written by the workers.
+
+    Args:
+        directory (str): The directory given to start_worker_profiler.
+        parent (cProfile.Profile, optional): The profile of the parent
+            process, merged with those of the workers if it holds any call.
+
+    Returns:
+        pstats.Stats: The merged stats, or None if nothing was profiled.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.pstats")))
+    stats = pstats.Stats(*paths) if paths else None
+    for path in paths:
+        os.remove(path)
+    os.rmdir(directory)
+    if parent is not None:
+        parent.create_stats()
+        if parent.stats:
+            if stats is None:
+                stats = pstats.Stats(parent)
+            else:
+                stats.add(parent)
+    return stats
+
+
+def time_breakdown(stats):
+    """Splits the profiled time between Board operations, strategy code
+    and the runner.
+
+    Every function's own time is charged to the part its file belongs to.
+    Functions outside the project are charged to the parts of their
+    callers, in proportion to the time each caller spent in them.
+
+    Args:
+        stats (pstats.Stats): The profile.
+
+    Returns:
+        dict: The seconds spent in each category of CATEGORIES.
+    """
+    entries = stats.stats
+    resolved = {}
+
+    def category(function, seen=()):
+        # A library function takes the category of its main caller
+        if function in resolved:
+            return resolved[function]
+        result = _file_category(function[0])
+        if result is None:
+            callers = entries.get(function, (0, 0, 0, 0, {}))[4]
+            result = "Runner"
+            if callers and function not in seen:
+                caller = max(callers, key=lambda name: callers[name][3])
+                result = category(caller, seen + (function,))
+        resolved[function] = result
+        return result
+
+    totals = dict.fromkeys(CATEGORIES, 0.0)
+    for function, (_, _, tottime, _, callers) in entries.items():
+        if _file_category(function[0]) is not None or not callers:
+            totals[category(function)] += tottime
+            continue
+        caller_time = sum(timing[2] for timing in callers.values())
+        for caller, timing in callers.items():
+            share = timing[2] / caller_time if caller_time else 1 / len(callers)
+            totals[category(caller)] += tottime * share
+    return totals
+
+
+def write_profile(stats, prefix, limit=40):
+    """Writes a profile as a pstats file and a sorted text report.
+
+    The .pstats file can be opened with the pstats module or with viewers
+    such as snakeviz, or turned into a flame graph by flameprof.
+
+    Args:
+        stats (pstats.Stats): The profile.
+        prefix (str): Path of the files, without extension.
+        limit (int, optional): Number of functions listed in the report.
+
+    Returns:
+        tuple: The paths of the pstats file and of the text report.
+    """
+    stats_path = f"{prefix}.pstats"
+    report_path = f"{prefix}.txt"
+    stats.dump_stats(stats_path)
+
+    breakdown = time_breakdown(stats)
+    total = sum(breakdown.values())
+    with open(report_path, "w") as file:
+        file.write(format_breakdown(breakdown) + "\n\n")
+        for sort_key in ("cumulative", "tottime"):
+            buffer = io.StringIO()
+            pstats.Stats(stats_path, stream=buffer).strip_dirs().sort_stats(
+                sort_key).print_stats(limit)
+            file.write(f"Top {limit} functions by {sort_key} time "
+                       f"(total {total:.2f}s)\n")
+            file.write(buffer.getvalue())
+    return stats_path, report_path
+
+
+def format_breakdown(breakdown):
+    """Formats the result of time_breakdown as lines of text."""
+    total = sum(breakdown.values()) or 1.0
+    lines = ["Time breakdown:"]
+    for name in CATEGORIES:
+        seconds = breakdown[name]
+        lines.append(f"  {name:<11}{seconds:9.2f}s {seconds / total:7.1%}")
+    return "\n".join(lines)
@@ -0,0 +1,114 @@
+import sys
+import time
+from commons import PLAYER1, PLAYER2, RESULT_DRAW
+
+
+# Seconds between two refreshes of the progress line on a terminal, and
+# between two log lines when the output is redirected
+TTY_INTERVAL = 0.25
+LOG_INTERVAL = 10.0
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """Progress of a run of games: games and moves per second and the
+    running score, refreshed at a fixed wall-clock rate.
+
+    Updating costs a counter increment and a clock read per game, whatever
+    the number of games. On a terminal a single line is rewritten in place;
+    otherwise a log line is written every LOG_INTERVAL seconds. Games played
+    by worker processes are reported by the parent as their results arrive.
+
+    Args:
+        total_games (int): The number of games of the run.
+        stream (file, optional): Where to write, by default stderr.
+        interval (float, optional): Seconds between two reports, by default
+            depending on whether stream is a terminal.
+        enabled (bool, optional): False to count without writing anything.
+    """
+
+    def __init__(self, total_games, stream=None, interval=None, enabled=True):
+        self.total_games = total_games
+        self.stream = stream if stream is not None else sys.stderr
+        self.tty = self.stream.isatty()
+        if interval is None:
+            interval = TTY_INTERVAL if self.tty else LOG_INTERVAL
+        self.interval = interval
+        self.enabled = enabled
+        self.games = 0
+        self.moves = 0
+        self.results = {PLAYER1: 0, PLAYER2: 0, RESULT_DRAW: 0}
+        self._start = time.perf_counter()
+        self._next_report = self._start + interval
+        self._line_length = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, result, moves):
+        """Counts a finished game.
+
+        Args:
+            result (int): The result of the game.
+            moves (int): The number of moves of the game.
+        """
+        self.games += 1
+        self.moves += moves
+        self.results[result] += 1
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self._write(self._status(now))
+
+    def close(self):
+        """Writes the final status and ends the progress line."""
+        if not self.enabled:
+            return
+        self._write(self._status(time.perf_counter()))
+        if self.tty:
+            self.stream.write("\n")
+            self.stream.flush()
+        self.enabled = False
+
+    def _status(self, now):
+        elapsed = now - self._start
+        games = self.games
+        rate = games / elapsed if elapsed else 0.0
+        parts = [f"Games {games}/{self.total_games}",
+                 f"{rate:.1f} games/s",
+                 f"{self.moves / elapsed if elapsed else 0.0:.0f} moves/s"]
+        if games:
+            parts.append(
+                f"P1 {self.results[PLAYER1] / games:.1%} "
+                f"P2 {self.results[PLAYER2] / games:.1%} "
+                f"Draws {self.results[RESULT_DRAW] / games:.1%}")
+        if rate and games < self.total_games:
+            parts.append(
+                f"ETA {_format_duration((self.total_games - games) / rate)}")
+        else:
+            parts.append(f"elapsed {_format_duration(elapsed)}")
+        return " | ".join(parts)
+
+    def _write(self, status):
+        if self.tty:
+            # Pad over the end of a longer previous line
+            padding = " " * max(0, self._line_length - len(status))
+            self.stream.write(f"\r{status}{padding}")
+            self._line_length = len(status)
+        else:
+            self.stream.write(status + "\n")
+        self.stream.flush()
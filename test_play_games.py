@@ -1,34 +1,55 @@
 import argparse
-import importlib
+import cProfile
+import json
+import multiprocessing
+import pstats
+import random
 from prettytable import PrettyTable
-from tqdm import tqdm
+from batch_board import play_batch_games
 from board import Board
 from commons import *
-
-
-from tqdm import tqdm
-
-def play_game(p1_strategy, p2_strategy, starting_player=PLAYER1, debug=False):
-    """Plays a single game between two strategies with a progress bar for moves."""
+from game_log import GameLogWriter
+from move_stats import MoveSummary
+from profiling import (
+    format_breakdown, merge_worker_profiles, run_profiled, run_worker_task,
+    start_worker_profiler, time_breakdown, worker_profile_dir, write_profile)
+from progress import ProgressReporter
+
+
+def play_game(p1_strategy, p2_strategy, starting_player=PLAYER1, debug=False,
+              move_records=None, move_times=None):
+    """Plays a single game between two strategies.
+
+    If move_records is a list, a record of every move is appended to it: the
+    ply, the player, the column and the stats of the strategy for the move.
+    If move_times is a list, a (player, wall time, nodes) tuple of every move
+    is appended to it.
+    """
 
     board = Board()
     board.current_player = starting_player  # Set the starting player
     player_strategies = {PLAYER1: p1_strategy, PLAYER2: p2_strategy}
 
-    if starting_player == PLAYER1:
-        p1_strategy.set_player_side(PLAYER1)
-        p2_strategy.set_player_side(PLAYER2)
-    else:
-        p1_strategy.set_player_side(PLAYER2)
-        p2_strategy.set_player_side(PLAYER1)
-
-    # Create a tqdm progress bar with a dynamic length based on maximum number of moves (9 for Tic Tac Toe)
-    with tqdm(total=ROWS*COLUMNS, desc="Game Progress", leave=False) as pbar:
-        while not board.is_gameover():
-            current_strategy = player_strategies[board.current_player]
-            move = current_strategy.play(board)
-            board.make_move(move)
-            pbar.update(1)  # Update the progress bar for each move
+    # Player 1 always plays the PLAYER1 pieces, whoever starts
+    p1_strategy.set_player_side(PLAYER1)
+    p2_strategy.set_player_side(PLAYER2)
+
+    while not board.is_gameover():
+        current_strategy = player_strategies[board.current_player]
+        move = current_strategy.play(board)
+        if move_records is not None:
+            move_records.append({
+                "ply": board.move_count,
+                "player": board.current_player,
+                "strategy": str(current_strategy),
+                "column": move,
+                **current_strategy.stats.as_dict(),
+            })
+        if move_times is not None:
+            stats = current_strategy.stats
+            move_times.append(
+                (board.current_player, stats.wall_time, stats.nodes))
+        board.make_move(move)
 
     if debug:
         if starting_player == PLAYER1:
@@ -40,19 +61,86 @@ def play_game(p1_strategy, p2_strategy, starting_player=PLAYER1, debug=False):
     return board
 
 
+def _start_game(game_index, seed):
+    """Seeds the random generator for a game of a run and returns the
+    starting player, which alternates with the game index."""
+    random.seed(seed + game_index)
+    return PLAYER1 if game_index % 2 == 0 else PLAYER2
+
+
+def play_seeded_game(p1_strategy, p2_strategy, game_index, seed, debug=False,
+                     move_records=None, move_times=None, game_log=None):
+    """Plays one game of a run, seeding the random generator for that game.
+
+    The starting player alternates with the game index, and every game gets
+    the seed `seed + game_index`, so each game can be replayed on its own,
+    in any order and in any process.
+
+    Args:
+        p1_strategy: The strategy for player 1.
+        p2_strategy: The strategy for player 2.
+        game_index (int): The index of the game in the run.
+        seed (int): The seed of the run.
+        debug (bool, optional): Print the final board. Defaults to False.
+        move_records (list, optional): A list the records of the moves are
+            appended to, tagged with the game index.
+        move_times (list, optional): A list the (player, wall time, nodes)
+            tuples of the moves are appended to.
+        game_log (GameLogWriter, optional): A log the game is written to.
+
+    Returns:
+        int: The result of the game.
+    """
+    starting_player = _start_game(game_index, seed)
+    game_records = [] if move_records is not None else None
+    final_board = play_game(
+        p1_strategy,
+        p2_strategy,
+        starting_player,
+        debug,
+        game_records,
+        move_times
+    )
+    if move_records is not None:
+        move_records.extend(
+            {"game": game_index, **record} for record in game_records)
+    result = final_board.get_game_result()
+    if game_log is not None:
+        game_log.write(game_index, starting_player, final_board.moves, result)
+    return result
+
+
+def _write_moves(moves_log, move_records):
+    for record in move_records:
+        moves_log.write(json.dumps(record) + "\n")
+
 
 def play_games(
         total_games,
         p1_strategy,
         p2_strategy,
-        debug=False):
+        debug=False,
+        seed=0,
+        summary=None,
+        progress=True,
+        game_log=None,
+        moves_log=None):
     """Plays multiple games between two strategies and prints the results.
 
     Args:
         total_games (int): The number of games to play.
         p1_strategy (function): The strategy for player 1.
         p2_strategy (function): The strategy for player 2.
-        play_single_game (function, optional): The function to play a single game. Defaults to play_game.
+        debug (bool, optional): Print every game. Defaults to False.
+        seed (int, optional): The seed of the run. Defaults to 0.
+        summary (MoveSummary, optional): Running totals every move is
+            added to.
+        progress (bool, optional): Report the progress of the run.
+            Defaults to True.
+        game_log (GameLogWriter, optional): A log every game is written to
+            as it ends.
+        moves_log (file, optional): A file the record of every move is
+            written to as a JSON line, as each game ends.
 
     Returns:
         dict: A dictionary containing the results of the games
@@ -63,62 +151,136 @@ def play_games(
         RESULT_DRAW: 0
     }
 
-    # Alternate starting player for each game
-    starting_player = PLAYER1
-
-    for i in tqdm(range(total_games), desc="Games"):
-        if debug:
-            print(f"Game {i + 1}/{total_games}")
-
-        final_board = play_game(
-            p1_strategy,
-            p2_strategy,
-            starting_player,
-            debug
-        )
-        result = final_board.get_game_result()
-        if debug:
-            print(f"Result: {result}")
-            
-        if result == RESULT_DRAW:
-            results[RESULT_DRAW] += 1
-        elif result == PLAYER1:
-            if starting_player == PLAYER1:
-                results[PLAYER1] += 1
-            else:
-                results[PLAYER2] += 1
-        elif result == PLAYER2:
-            if starting_player == PLAYER1:
-                results[PLAYER2] += 1
-            else:
-                results[PLAYER1] += 1
-        
-        # Alternate the starting player
-        starting_player = PLAYER2 if starting_player == PLAYER1 else PLAYER1
+    # The boards printed in debug mode would break the progress line
+    with ProgressReporter(
+            total_games, enabled=progress and not debug) as reporter:
+        for i in range(total_games):
+            if debug:
+                print(f"Game {i + 1}/{total_games}")
+
+            # Only the moves of the current game are kept
+            move_times = []
+            move_records = [] if moves_log is not None else None
+            result = play_seeded_game(
+                p1_strategy, p2_strategy, i, seed, debug, move_records,
+                move_times, game_log)
+            if debug:
+                print(f"Result: {result}")
+
+            results[result] += 1
+            reporter.update(result, len(move_times))
+            if summary is not None:
+                for move in move_times:
+                    summary.add(*move)
+            if moves_log is not None:
+                _write_moves(moves_log, move_records)
 
     return results
 
 
-def load_strategy(strategy_name):
-    """
-    Dynamically loads a strategy class from its module path.
+# Strategies, seed and options of a worker process of play_games_parallel
+_worker_strategies = None
+_worker_seed = None
+_worker_log_moves = False
+
+
+def _init_worker(p1_name, p2_name, seed, cache=None, profile_dir=None,
+                 log_moves=False):
+    global _worker_strategies, _worker_seed, _worker_log_moves
+    if profile_dir is not None:
+        start_worker_profiler(profile_dir)
+    _worker_strategies = (
+        load_strategy(p1_name, cache), load_strategy(p2_name, cache))
+    _worker_seed = seed
+    _worker_log_moves = log_moves
+
+
+def _play_worker_game(game_index):
+    p1_strategy, p2_strategy = _worker_strategies
+    starting_player = _start_game(game_index, _worker_seed)
+    move_times = []
+    move_records = [] if _worker_log_moves else None
+    board = run_worker_task(
+        play_game, p1_strategy, p2_strategy, starting_player,
+        move_records=move_records, move_times=move_times)
+    if move_records is not None:
+        move_records = [
+            {"game": game_index, **record} for record in move_records]
+    return (game_index, starting_player, board.get_game_result(),
+            board.moves, move_times, move_records)
+
+
+def play_games_parallel(total_games, p1_name, p2_name, workers, seed=0,
+                        cache=None, summary=None, profile_dir=None,
+                        progress=True, game_log=None, moves_log=None,
+                        profiler=None):
+    """Plays multiple games between two strategies in a pool of processes.
+
+    Every worker loads its own instances of the strategies. The games are
+    seeded as in play_games, so the results match a serial run with the
+    same seed.
 
     Args:
-        strategy_name (str): The name of the strategy.
+        total_games (int): The number of games to play.
+        p1_name (str): The name of the strategy for player 1.
+        p2_name (str): The name of the strategy for player 2.
+        workers (int): The number of worker processes.
+        seed (int, optional): The seed of the run. Defaults to 0.
+        cache (str, optional): The position cache file of the strategies.
+        summary (MoveSummary, optional): Running totals every move is
+            added to.
+        profile_dir (str, optional): Profile the workers, writing their
+            stats to this directory when they exit.
+        progress (bool, optional): Report the progress of the run.
+            Defaults to True.
+        game_log (GameLogWriter, optional): A log every game is written to
+            as its result arrives.
+        moves_log (file, optional): A file the record of every move is
+            written to as a JSON line, in the order the games complete.
+        profiler (cProfile.Profile, optional): Profiles the handling of the
+            results in this process, leaving out the time spent waiting for
+            the workers.
 
     Returns:
-        An instance of the strategy class.
-
-    Raises:
-        ValueError: If the strategy is not found.
+        dict: A dictionary containing the results of the games
     """
-    if strategy_name not in STRATEGY_MODULES:
-        raise ValueError(f"Unknown strategy: {strategy_name}")
+    results = {
+        PLAYER1: 0,
+        PLAYER2: 0,
+        RESULT_DRAW: 0
+    }
+
+    # Results are counted and reported as they stream back, in completion
+    # order
+    with multiprocessing.Pool(
+            workers, _init_worker,
+            (p1_name, p2_name, seed, cache, profile_dir,
+             moves_log is not None)) as pool, \
+            ProgressReporter(total_games, enabled=progress) as reporter:
+        games = pool.imap_unordered(
+            _play_worker_game,
+            range(total_games),
+            chunksize=max(1, total_games // (workers * 20)))
+
+        def record(game_index, starting_player, result, columns, move_times,
+                   move_records):
+            results[result] += 1
+            reporter.update(result, len(columns))
+            if summary is not None:
+                for move in move_times:
+                    summary.add(*move)
+            if game_log is not None:
+                game_log.write(game_index, starting_player, columns, result)
+            if moves_log is not None:
+                _write_moves(moves_log, move_records)
+
+        for game in games:
+            run_profiled(profiler, record, *game)
+        # Let the workers exit on their own, writing their profiles
+        pool.close()
+        pool.join()
 
-    module_path, class_name = STRATEGY_MODULES[strategy_name].rsplit(".", 1)
-    module = importlib.import_module(module_path)
-    strategy_class = getattr(module, class_name)
-    return strategy_class()
+    return results
 
 
 def main():
@@ -139,24 +301,96 @@ def main():
     parser.add_argument("--games", type=int, default=100,
                         help="Number of games to simulate (default: 100).")
     parser.add_argument("--debug", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes playing the games (default: 1).")
+    parser.add_argument("--batch", action=argparse.BooleanOptionalAction,
+                        help="Play all the games in lockstep with the batched engine.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of the run; game i uses seed + i (default: random).")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="SQLite file of a position cache kept across runs.")
+    parser.add_argument("--moves-log", type=str, default=None,
+                        help="JSON Lines file to write the stats of every move to.")
+    parser.add_argument("--game-log", type=str, default=None,
+                        help="JSON Lines file every game is appended to (see game_log.py).")
+    parser.add_argument("--profile", type=str, nargs="?", const="profile",
+                        default=None, metavar="PREFIX",
+                        help="Profile the run, writing PREFIX.pstats and PREFIX.txt (default prefix: profile).")
 
     args = parser.parse_args()
-
-    # Load strategies
-    player1_strategy = load_strategy(args.player1)
-    player2_strategy = load_strategy(args.player2)
+    if args.batch and (args.moves_log or args.game_log):
+        parser.error("--moves-log and --game-log are not available with --batch")
+    if args.seed is None:
+        args.seed = random.randrange(2**32)
 
     # Simulate games
     print(
         f"Simulating {
             args.games} games between {
             args.player1} and {
-                args.player2}...")
-    results = play_games(
-        args.games,
-        player1_strategy,
-        player2_strategy,
-        args.debug)
+                args.player2} (seed {
+                    args.seed})...")
+    # Per-move stats are not collected by the batched engine
+    summary = None if args.batch else MoveSummary()
+    # The serial runs are profiled in this process, the parallel ones in
+    # every worker and in this process while it handles the results
+    profiler = None
+    profile_dir = None
+    profile_stats = None
+    if args.profile and args.workers > 1 and not args.batch:
+        profile_dir = worker_profile_dir()
+        parent_profiler = cProfile.Profile()
+    elif args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    game_log = None
+    if args.game_log:
+        game_log = GameLogWriter(
+            args.game_log, args.player1, args.player2, args.seed)
+    moves_log = open(args.moves_log, "w") if args.moves_log else None
+    if args.batch:
+        results = play_batch_games(
+            args.games,
+            load_strategy(args.player1, args.cache),
+            load_strategy(args.player2, args.cache),
+            args.seed)
+    elif args.workers > 1:
+        results = play_games_parallel(
+            args.games,
+            args.player1,
+            args.player2,
+            args.workers,
+            args.seed,
+            args.cache,
+            summary,
+            profile_dir,
+            game_log=game_log,
+            moves_log=moves_log,
+            profiler=parent_profiler if profile_dir is not None else None)
+    else:
+        # Load strategies
+        player1_strategy = load_strategy(args.player1, args.cache)
+        player2_strategy = load_strategy(args.player2, args.cache)
+
+        results = play_games(
+            args.games,
+            player1_strategy,
+            player2_strategy,
+            args.debug,
+            args.seed,
+            summary,
+            game_log=game_log,
+            moves_log=moves_log)
+
+    if game_log is not None:
+        game_log.close()
+    if moves_log is not None:
+        moves_log.close()
+    if profiler is not None:
+        profiler.disable()
+        profile_stats = pstats.Stats(profiler)
+    elif profile_dir is not None:
+        profile_stats = merge_worker_profiles(profile_dir, parent_profiler)
 
     # RESULTS
     table = PrettyTable()
@@ -179,6 +413,32 @@ def main():
     print("\nResults:")
     print(table)
 
+    if summary is not None:
+        table = PrettyTable()
+        table.field_names = ["Strategy", "Moves", "p50 (ms)", "p95 (ms)",
+                             "Max (ms)", "Nodes/s"]
+        for player, name in ((PLAYER1, args.player1), (PLAYER2, args.player2)):
+            stats = summary.statistics(player)
+            if stats is None:
+                continue
+            table.add_row([f"Player {player}: {name}", stats["moves"],
+                           f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}",
+                           f"{stats['max_ms']:.2f}",
+                           f"{stats['nodes_per_second']:.0f}"])
+        table.align = "r"
+        table.align["Strategy"] = "l"
+        print("\nMove statistics:")
+        print(table)
+
+    if args.moves_log:
+        print(f"Wrote the moves to {args.moves_log}")
+
+    if profile_stats is not None:
+        stats_path, report_path = write_profile(profile_stats, args.profile)
+        print()
+        print(format_breakdown(time_breakdown(profile_stats)))
+        print(f"Wrote {stats_path} and {report_path}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,350 @@
+import argparse
+import ast
+import itertools
+import math
+import random
+from prettytable import PrettyTable
+from commons import *
+from game_log import GameLogWriter
+from test_play_games import play_seeded_game
+
+
+# Players of the default tournament: every strategy with its default
+# options, and minimax at a shallower and a deeper fixed depth. The solver
+# spends seconds per move in the opening, more than all the others
+# together, so it only plays when asked, with a small budget
+DEFAULT_PLAYERS = [name for name in STRATEGY_MODULES if name != "solver"] + [
+    "minimax:depth=2", "minimax:depth=6"]
+SOLVER_PLAYER = "solver:time_ms=100,fallback_ms=100"
+
+# The test of a pairing tells apart a player stronger by ELO_BOUND from one
+# weaker by as much, with error rates ALPHA and BETA. Pairings closer than
+# that stop after MAX_GAMES games.
+ELO_BOUND = 50.0
+ALPHA = 0.05
+BETA = 0.05
+MIN_GAMES = 10
+MAX_GAMES = 400
+
+# Outcomes of the test of a pairing
+H1 = "H1"  # The first player is the stronger
+H0 = "H0"  # The second player is the stronger
+UNDECIDED = "undecided"
+
+
+def parse_player(spec):
+    """Parses a player of the tournament: a strategy name, optionally
+    followed by its options, as in `minimax:depth=6,heuristic=False`.
+
+    Args:
+        spec (str): The player.
+
+    Returns:
+        tuple: The name of the strategy and its options.
+
+    Raises:
+        ValueError: If the strategy is unknown or an option is malformed.
+    """
+    name, _, options_spec = spec.partition(":")
+    if name not in STRATEGY_MODULES:
+        raise ValueError(f"Unknown strategy: {name}")
+    options = {}
+    for option in filter(None, options_spec.split(",")):
+        key, separator, value = option.partition("=")
+        if not separator:
+            raise ValueError(f"Malformed option {option!r} in {spec!r}")
+        try:
+            options[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            options[key] = value
+    return name, options
+
+
+def expected_score(elo):
+    """Returns the expected score of a player stronger by elo points."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_llr(wins, draws, losses, elo0=-ELO_BOUND, elo1=ELO_BOUND):
+    """Log-likelihood ratio of elo1 against elo0 for the results of a
+    pairing, with the normal approximation of the generalized SPRT.
+
+    Half a win and half a loss are added to the results, so that a pairing
+    won or lost every time has a finite variance.
+
+    Args:
+        wins (int): The games won by the first player.
+        draws (int): The games drawn.
+        losses (int): The games lost by the first player.
+        elo0 (float, optional): The Elo difference of the null hypothesis.
+        elo1 (float, optional): The Elo difference of the alternative.
+
+    Returns:
+        float: The log-likelihood ratio.
+    """
+    wins += 0.5
+    losses += 0.5
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    score0 = expected_score(elo0)
+    score1 = expected_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (
+        2 * variance)
+
+
+def sprt_bounds(alpha=ALPHA, beta=BETA):
+    """Returns the lower and upper log-likelihood ratio bounds of the test."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def play_pairing(p1_spec, p2_spec, seed=0, min_games=MIN_GAMES,
+                 max_games=MAX_GAMES, elo_bound=ELO_BOUND, alpha=ALPHA,
+                 beta=BETA, game_log=None):
+    """Plays a pairing until the SPRT decides which player is stronger.
+
+    Games are played in pairs, each player starting one of them, and seeded
+    as in play_games, so a pairing can be replayed with test_play_games.
+
+    Args:
+        p1_spec (str): The first player.
+        p2_spec (str): The second player.
+        seed (int, optional): The seed of the pairing. Defaults to 0.
+        min_games (int, optional): Games played before testing.
+        max_games (int, optional): Games after which the pairing stops
+            undecided.
+        elo_bound (float, optional): The test decides between the first
+            player being stronger and weaker by this many Elo points.
+        alpha (float, optional): Probability of deciding for the first
+            player when it is weaker by elo_bound.
+        beta (float, optional): Probability of deciding for the second
+            player when the first is stronger by elo_bound.
+        game_log (str, optional): A game log every game is appended to.
+
+    Returns:
+        dict: The wins, draws and losses of the first player, the final
+            log-likelihood ratio and the outcome of the test.
+    """
+    p1_name, p1_options = parse_player(p1_spec)
+    p2_name, p2_options = parse_player(p2_spec)
+    p1_strategy = load_strategy(p1_name, **p1_options)
+    p2_strategy = load_strategy(p2_name, **p2_options)
+    lower, upper = sprt_bounds(alpha, beta)
+    counts = {PLAYER1: 0, RESULT_DRAW: 0, PLAYER2: 0}
+    outcome = UNDECIDED
+    llr = 0.0
+    log = GameLogWriter(game_log, p1_spec, p2_spec, seed) if game_log else None
+    try:
+        game_index = 0
+        while game_index < max_games:
+            # Each player starts one game of the pair
+            for _ in range(2):
+                result = play_seeded_game(
+                    p1_strategy, p2_strategy, game_index, seed,
+                    game_log=log)
+                counts[result] += 1
+                game_index += 1
+            llr = sprt_llr(counts[PLAYER1], counts[RESULT_DRAW],
+                           counts[PLAYER2], -elo_bound, elo_bound)
+            if game_index < min_games:
+                continue
+            if llr >= upper:
+                outcome = H1
+                break
+            if llr <= lower:
+                outcome = H0
+                break
+    finally:
+        if log is not None:
+            log.close()
+        for strategy in (p1_strategy, p2_strategy):
+            if hasattr(strategy, "close"):
+                strategy.close()
+
+    return {
+        "wins": counts[PLAYER1],
+        "draws": counts[RESULT_DRAW],
+        "losses": counts[PLAYER2],
+        "llr": llr,
+        "outcome": outcome,
+    }
+
+
+def elo_ratings(players, pairings, iterations=1000, tolerance=1e-9):
+    """Fits Elo ratings to the results of a round robin.
+
+    The ratings maximize the likelihood of the Bradley-Terry model, draws
+    counting half a win, with the minorization-maximization updates. A
+    virtual draw is added to every pairing, so that players who won or lost
+    every game still get a finite rating.
+
+    Args:
+        players (list): The players.
+        pairings (dict): The results of each pair of players, keyed by
+            (first, second), as returned by play_pairing.
+
+    Returns:
+        dict: The rating of every player, averaging 0.
+    """
+    # Score and games of every player against every opponent
+    scores = {player: 0.0 for player in players}
+    games = {player: {} for player in players}
+    for (first, second), result in pairings.items():
+        played = result["wins"] + result["draws"] + result["losses"] + 1
+        first_score = result["wins"] + 0.5 * (result["draws"] + 1)
+        scores[first] += first_score
+        scores[second] += played - first_score
+        games[first][second] = games[first].get(second, 0) + played
+        games[second][first] = games[second].get(first, 0) + played
+
+    strength = {player: 1.0 for player in players}
+    for _ in range(iterations):
+        updated = {}
+        for player in players:
+            denominator = sum(
+                count / (strength[player] + strength[opponent])
+                for opponent, count in games[player].items())
+            updated[player] = (
+                scores[player] / denominator if denominator else 1.0)
+        # Normalize the geometric mean to 1, i.e. the mean rating to 0
+        mean_log = sum(math.log(value) for value in updated.values()) / len(
+            updated)
+        updated = {player: value / math.exp(mean_log)
+                   for player, value in updated.items()}
+        change = max(abs(updated[player] - strength[player])
+                     for player in players)
+        strength = updated
+        if change < tolerance:
+            break
+
+    return {player: 400 * math.log10(strength[player]) for player in players}
+
+
+def run_tournament(players, seed=0, game_log=None, **test_options):
+    """Plays every pairing of a round robin with early stopping.
+
+    Args:
+        players (list): The players, as strategy names with options.
+        seed (int, optional): The seed of the tournament; every pairing
+            gets its own seed derived from it.
+        game_log (str, optional): A game log every game is appended to.
+        **test_options: Options of play_pairing for the test.
+
+    Returns:
+        dict: The results of each pair of players.
+    """
+    pairings = {}
+    pairs = list(itertools.combinations(players, 2))
+    for index, (first, second) in enumerate(pairs):
+        pairing_seed = seed + index * 1_000_000
+        print(f"[{index + 1}/{len(pairs)}] {first} vs {second}...",
+              end=" ", flush=True)
+        result = play_pairing(first, second, pairing_seed,
+                              game_log=game_log, **test_options)
+        pairings[first, second] = result
+        played = result["wins"] + result["draws"] + result["losses"]
+        print(f"{played} games, +{result['wins']} ={result['draws']} "
+              f"-{result['losses']}, LLR {result['llr']:.2f}, "
+              f"{_verdict(first, second, result['outcome'])}")
+    return pairings
+
+
+def _verdict(first, second, outcome):
+    if outcome == H1:
+        return f"{first} stronger"
+    if outcome == H0:
+        return f"{second} stronger"
+    return "undecided"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Round robin between strategies, stopping every pairing "
+                    "as soon as a sequential probability ratio test decides it.")
+    parser.add_argument("--players", nargs="+", default=DEFAULT_PLAYERS,
+                        metavar="PLAYER",
+                        help="Strategies, with options as in minimax:depth=6 "
+                             "(default: every strategy but the solver, and minimax at depths 2 and 6).")
+    parser.add_argument("--with-solver", action="store_true",
+                        help=f"Add the solver to the players, as {SOLVER_PLAYER}.")
+    parser.add_argument("--elo-bound", type=float, default=ELO_BOUND,
+                        help=f"Elo difference the test tells apart in either direction (default: {ELO_BOUND:g}).")
+    parser.add_argument("--alpha", type=float, default=ALPHA,
+                        help=f"Error rate of the test towards the first player (default: {ALPHA}).")
+    parser.add_argument("--beta", type=float, default=BETA,
+                        help=f"Error rate of the test towards the second player (default: {BETA}).")
+    parser.add_argument("--min-games", type=int, default=MIN_GAMES,
+                        help=f"Games of a pairing before testing (default: {MIN_GAMES}).")
+    parser.add_argument("--max-games", type=int, default=MAX_GAMES,
+                        help=f"Games after which a pairing stops undecided (default: {MAX_GAMES}).")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of the tournament (default: random).")
+    parser.add_argument("--game-log", type=str, default=None,
+                        help="JSON Lines file every game is appended to (see game_log.py).")
+
+    args = parser.parse_args()
+    if args.with_solver:
+        args.players = args.players + [SOLVER_PLAYER]
+    try:
+        for spec in args.players:
+            parse_player(spec)
+    except ValueError as error:
+        parser.error(str(error))
+    if len(set(args.players)) != len(args.players):
+        parser.error("Every player must appear once")
+    if args.seed is None:
+        args.seed = random.randrange(2**32)
+
+    print(f"Round robin of {len(args.players)} players (seed {args.seed})")
+    pairings = run_tournament(
+        args.players, args.seed, args.game_log,
+        min_games=args.min_games, max_games=args.max_games,
+        elo_bound=args.elo_bound, alpha=args.alpha, beta=args.beta)
+
+    table = PrettyTable()
+    table.field_names = ["Pairing", "Games", "W", "D", "L", "Score (%)",
+                         "LLR", "Result"]
+    total_games = 0
+    for (first, second), result in pairings.items():
+        played = result["wins"] + result["draws"] + result["losses"]
+        total_games += played
+        score = (result["wins"] + 0.5 * result["draws"]) / played
+        table.add_row([f"{first} vs {second}", played, result["wins"],
+                       result["draws"], result["losses"], f"{score * 100:.1f}%",
+                       f"{result['llr']:.2f}",
+                       _verdict(first, second, result["outcome"])])
+    table.align = "r"
+    table.align["Pairing"] = "l"
+    table.align["Result"] = "l"
+    print("\nPairings:")
+    print(table)
+    budget = len(pairings) * args.max_games
+    print(f"{total_games} games played, {total_games / budget:.0%} of "
+          f"{args.max_games} games per pairing.")
+
+    ratings = elo_ratings(args.players, pairings)
+    table = PrettyTable()
+    table.field_names = ["Rank", "Player", "Elo", "Games", "Score (%)"]
+    ranking = sorted(args.players, key=ratings.get, reverse=True)
+    for rank, player in enumerate(ranking, 1):
+        played = 0
+        score = 0.0
+        for (first, second), result in pairings.items():
+            games = result["wins"] + result["draws"] + result["losses"]
+            if player == first:
+                played += games
+                score += result["wins"] + 0.5 * result["draws"]
+            elif player == second:
+                played += games
+                score += result["losses"] + 0.5 * result["draws"]
+        table.add_row([rank, player, f"{ratings[player]:+.0f}", played,
+                       f"{score / played * 100:.1f}%" if played else "-"])
+    table.align = "r"
+    table.align["Player"] = "l"
+    print("\nElo ratings:")
+    print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Bound types of the stored scores
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable:
+    """Fixed-capacity cache of search results, keyed by position hash.
+
+    Every key maps to one of max_entries slots, so memory stays bounded no
+    matter how many positions are searched. When two positions compete for a
+    slot, the entry searched deeper in the current search is kept; entries
+    left over from earlier searches are always replaced.
+    """
+
+    def __init__(self, max_entries=1 << 18):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # slot -> (key, depth, bound, value, move, generation)
+        self._entries = {}
+
+    def new_search(self):
+        """Marks the start of a new search, ageing the current entries."""
+        self.generation += 1
+
+    def clear(self):
+        """Removes every entry."""
+        self._entries = {}
+
+    def lookup(self, key):
+        """Looks up a position.
+
+        Args:
+            key (int): The hash of the position.
+
+        Returns:
+            tuple: The (key, depth, bound, value, move, generation) entry of
+                the position, or None if it is not stored.
+        """
+        entry = self._entries.get(key % self.max_entries)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        """Stores the result of a search.
+
+        Args:
+            key (int): The hash of the position.
+            depth (int): The depth the position was searched to.
+            bound (int): EXACT, LOWER_BOUND or UPPER_BOUND.
+            value (float): The score of the position.
+            move (int): The best move found, or None.
+        """
+        slot = key % self.max_entries
+        old = self._entries.get(slot)
+        if old is not None and old[0] != key:
+            if old[5] == self.generation and old[1] > depth:
+                return
+            self.evictions += 1
+        self._entries[slot] = (
+            key, depth, bound, value, move, self.generation)
+
+    def __len__(self):
+        return len(self._entries)